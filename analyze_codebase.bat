@@ -12,7 +12,7 @@ if %errorlevel% neq 0 (
 )
 
 REM Run the analysis
-python codebase_analyzer.py
+python -m codebase_analyzer
 
 echo.
 echo ✅ Analysis complete!
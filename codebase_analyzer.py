@@ -5,23 +5,1186 @@ Analyzes a codebase and provides detailed line count statistics by root-level di
 """
 
 import os
+import io
 import sys
+import json
+import operator
+import re
+import codecs
+import select
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from itertools import compress, count, islice, repeat
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import reduce
+from contextlib import closing, contextmanager, nullcontext, redirect_stdout
 import argparse
+import heapq
 from datetime import datetime
 
+# Modules only some runs need (sqlite3, subprocess, hashlib, threading,
+# concurrent.futures and multiprocessing) are imported where they are used,
+# so `--help` and runs on small trees start fast. See
+# `scripts/analyzer-benchmark.py startup`.
+
+# Bump whenever counting logic changes so stale cache entries are discarded
+CACHE_VERSION = 4
+
+# Upper bound on remembered blob counts in --git mode
+MAX_BLOB_CACHE_ENTRIES = 200_000
+
+# Per-directory totals of --since base revisions kept, keyed by tree
+MAX_BASELINES = 20
+
+# git file modes counted as regular files (symlinks and submodules are not)
+GIT_FILE_MODES = (b'100644', b'100755')
+
+# Streaming reader chunk size
+READ_CHUNK_SIZE = 1 << 20
+# Average lines per possible comment or string opener below which
+# classify_block() walks line by line, estimated from the block's first
+# DENSITY_SAMPLE_SIZE characters
+BULK_MIN_RUN = 16
+DENSITY_SAMPLE_SIZE = 1 << 16
+
+# Runs kept in reports/codebase_history.sqlite; older ones are pruned on insert.
+# Working-tree runs have no revision; --git/--since runs scan a different file
+# set and are kept as a separate series.
+MAX_HISTORY_RUNS = 2000
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    revision TEXT,
+    files INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    code_lines INTEGER NOT NULL,
+    comment_lines INTEGER NOT NULL,
+    blank_lines INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS directory_totals (
+    directory TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    code_lines INTEGER NOT NULL,
+    comment_lines INTEGER NOT NULL,
+    blank_lines INTEGER NOT NULL,
+    PRIMARY KEY (directory, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS directory_totals_by_run ON directory_totals (run_id);
+"""
+HISTORY_METRICS = ('files', 'lines', 'code_lines', 'comment_lines', 'blank_lines')
+
+# --watch: changes are batched until DEBOUNCE seconds pass without a new
+# event, or at most MAX_DELAY seconds after the first one
+WATCH_DEBOUNCE = 0.5
+WATCH_MAX_DELAY = 5.0
+WATCH_POLL_INTERVAL = 2.0
+
+# --io-threads: files up to this size are read whole by the reader threads;
+# bigger ones are streamed by the counting stage itself
+IO_PREFETCH_LIMIT = 4 << 20
+# Reads (and counting batches) kept in flight per reader thread (and worker)
+IO_QUEUE_DEPTH = 2
+# Batches with fewer uncached files are counted in-process: starting the
+# worker pool costs more than it saves
+PARALLEL_MIN_FILES = 32
+# Prefetched files are sent to the worker pool in batches of about this many bytes
+IO_BATCH_BYTES = 1 << 20
+IO_BATCH_FILES = 64
+
+# --estimate: default share of each (root directory, extension) stratum that
+# is read, the minimum sample per stratum, and the z-score of the reported
+# confidence intervals (95%)
+ESTIMATE_RATE = 0.05
+MIN_STRATUM_SAMPLES = 3
+ESTIMATE_Z = 1.96
+
+# Pre-read sniffing: files are classified from their first SNIFF_SIZE bytes.
+# Binary files are skipped; minified, generated and oversized files only have
+# their newlines counted, since classifying their lines is slow and meaningless.
+SNIFF_SIZE = 8192
+MAX_CLASSIFIED_SIZE = 16 << 20
+MINIFIED_LINE_LENGTH = 1000
+GENERATED_MARKERS = (b'@generated', b'do not edit', b'auto-generated', b'autogenerated',
+                     b'code generated by')
+SNIFF_REASONS = {
+    'binary': 'NUL bytes in the first 8 KB; skipped',
+    'minified': f'average line longer than {MINIFIED_LINE_LENGTH:,} characters; lines counted only',
+    'generated': 'generated-file marker in the header; lines counted only',
+    'oversized': f'larger than {MAX_CLASSIFIED_SIZE >> 20} MB; lines counted only',
+}
+
+# Comment syntax per language: line comment tokens, (open, close) block
+# comment delimiters and multi-line string delimiters. Only tokens at the
+# start of a line mark it as a comment; lines inside a multi-line string are
+# code even if they look like comments. Python docstrings count as comments.
+LANGUAGE_RULES = {
+    'c': {'line': ('//',), 'block': (('/*', '*/'),)},
+    'javascript': {'line': ('//',), 'block': (('/*', '*/'),), 'strings': ('`',)},
+    'go': {'line': ('//',), 'block': (('/*', '*/'),), 'strings': ('`',)},
+    'java': {'line': ('//',), 'block': (('/*', '*/'),), 'strings': ('"""',)},
+    'php': {'line': ('//', '#'), 'block': (('/*', '*/'),)},
+    'python': {'line': ('#',), 'block': (('"""', '"""'), ("'''", "'''")),
+               'strings': ('"""', "'''")},
+    'ruby': {'line': ('#',), 'block': (('=begin', '=end'),)},
+    'shell': {'line': ('#',)},
+    'ini': {'line': (';', '#')},
+    'powershell': {'line': ('#',), 'block': (('<#', '#>'),)},
+    'batch': {'line': ('::', 'REM ', 'rem ', '@REM ', '@rem ')},
+    'sql': {'line': ('--',), 'block': (('/*', '*/'),)},
+    'css': {'block': (('/*', '*/'),)},
+    'scss': {'line': ('//',), 'block': (('/*', '*/'),)},
+    'markup': {'block': (('<!--', '-->'),)},
+    'component': {'line': ('//',), 'block': (('<!--', '-->'), ('/*', '*/')), 'strings': ('`',)},
+    'text': {},
+}
+
+# Language of every extension in CodebaseAnalyzer.code_extensions
+EXTENSION_LANGUAGES = {
+    '.c': 'c', '.h': 'c', '.cpp': 'c', '.hpp': 'c', '.cs': 'c', '.m': 'c', '.mm': 'c',
+    '.rs': 'c',
+    '.js': 'javascript', '.jsx': 'javascript', '.ts': 'javascript', '.tsx': 'javascript',
+    '.go': 'go',
+    '.java': 'java', '.kt': 'java', '.scala': 'java', '.swift': 'java',
+    '.php': 'php',
+    '.py': 'python',
+    '.rb': 'ruby',
+    '.sh': 'shell', '.bash': 'shell', '.zsh': 'shell', '.fish': 'shell', '.r': 'shell',
+    '.yaml': 'shell', '.yml': 'shell', '.toml': 'shell', '.dockerfile': 'shell',
+    '.dockerignore': 'shell', '.gitignore': 'shell', '.env': 'shell',
+    '.ini': 'ini', '.cfg': 'ini', '.conf': 'ini',
+    '.ps1': 'powershell',
+    '.bat': 'batch', '.cmd': 'batch',
+    '.sql': 'sql',
+    '.css': 'css',
+    '.scss': 'scss', '.sass': 'scss', '.less': 'scss',
+    '.html': 'markup', '.xml': 'markup',
+    '.vue': 'component', '.svelte': 'component',
+    '.json': 'text', '.md': 'text', '.txt': 'text',
+}
+
+
+class CommentSyntax:
+    """One language's comment rules, precompiled for line classification.
+
+    State carried between lines is None or a (closer, is_comment) pair:
+    inside a block comment (is_comment True) non-blank lines are comments,
+    inside a multi-line string they are code.
+    """
+
+    def __init__(self, line=(), block=(), strings=()):
+        self.line_tokens = tuple(line)
+        self.block_closers = dict(block)
+        # Longest first so an opener never shadows a longer one it prefixes
+        self.block_openers = tuple(sorted(self.block_closers, key=len, reverse=True))
+        self.string_delimiters = tuple(strings)
+        # Everything a comment line can start with, checked in a single startswith()
+        self.comment_prefixes = self.line_tokens + self.block_openers
+        # A block containing none of these can be counted without tracking state
+        self.state_markers = self.block_openers + self.string_delimiters
+
+    def open_state(self, stripped):
+        """Return the state a non-blank line outside any comment or string leaves behind."""
+        if stripped.startswith(self.block_openers):
+            for opener in self.block_openers:
+                if stripped.startswith(opener):
+                    closer = self.block_closers[opener]
+                    if closer not in stripped[len(opener):]:
+                        return closer, True
+                    return None
+        if not stripped.startswith(self.comment_prefixes):
+            for delimiter in self.string_delimiters:
+                if stripped.count(delimiter) % 2:
+                    return delimiter, False
+        return None
+
+    def closes(self, stripped, state):
+        """Return True if a non-blank line inside a comment or string ends it."""
+        closer, is_comment = state
+        if is_comment:
+            return closer in stripped
+        return stripped.count(closer) % 2 == 1
+
+
+# Compiled once at import, so worker processes get them for free too
+COMMENT_SYNTAX = {language: CommentSyntax(**rules) for language, rules in LANGUAGE_RULES.items()}
+
+
+def language_for_path(file_path):
+    """Return the LANGUAGE_RULES key for a file, by extension."""
+    return EXTENSION_LANGUAGES.get(Path(file_path).suffix.lower(), 'text')
+
+def classify_lines(lines, syntax):
+    """Count blank, comment and code lines in an iterable of text lines."""
+    total_lines = 0
+    blank_lines = 0
+    comment_lines = 0
+    code_lines = 0
+    
+    # Open block comment or multi-line string, if any
+    state = None
+    
+    for line in lines:
+        total_lines += 1
+        stripped = line.strip()
+        
+        if not stripped:
+            blank_lines += 1
+        elif state is not None:
+            if state[1]:
+                comment_lines += 1
+            else:
+                code_lines += 1
+            if syntax.closes(stripped, state):
+                state = None
+        else:
+            if stripped.startswith(syntax.comment_prefixes):
+                comment_lines += 1
+            else:
+                code_lines += 1
+            state = syntax.open_state(stripped)
+    
+    return {
+        'total': total_lines,
+        'blank': blank_lines,
+        'comments': comment_lines,
+        'code': code_lines
+    }
+
+
+def iter_stream_blocks(read, chunk_size=READ_CHUNK_SIZE):
+    """Yield blocks of complete text lines from a binary read(n) callable.
+
+    Each block is a run of lines joined by newlines (no trailing newline),
+    so splitting it on newlines gives exactly the lines readlines() would
+    return on a text-mode file, minus their endings: UTF-8 decoding with errors
+    ignored, then universal newlines. Works on fixed-size chunks, so memory
+    is bounded by the chunk size plus the longest line; lines are always
+    passed on whole, as the classifier looks for closers and delimiters
+    anywhere in them. count_sniffed_lines() only classifies files up to
+    MAX_CLASSIFIED_SIZE, which caps that.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    # Pieces of the unterminated last line, joined once its end arrives
+    pending = []
+    held = ''
+    while True:
+        chunk = read(chunk_size)
+        data = held + decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            break
+        # Hold back a trailing '\r' so a '\r\n' split across chunks stays one line ending
+        held = ''
+        if data.endswith('\r'):
+            data, held = data[:-1], '\r'
+        if '\r' in data:
+            data = data.replace('\r\n', '\n').replace('\r', '\n')
+        end = data.rfind('\n')
+        if end < 0:
+            pending.append(data)
+            continue
+        yield ''.join(pending) + data[:end]
+        pending = [data[end + 1:]]
+    
+    if '\r' in data:
+        data = data.replace('\r\n', '\n').replace('\r', '\n')
+    data = ''.join(pending) + data
+    if data:
+        yield data[:-1] if data.endswith('\n') else data
+
+
+def classify_block(block, syntax, state=None):
+    """Classify every line of a block at once, matching classify_lines() exactly.
+
+    Strips and tests all lines through map() and list.count(), which run
+    in C, instead of branching per line in Python. Outside a comment or
+    string a line's class depends only on the line itself, so runs of lines
+    between those that could open one are counted in bulk; inside one,
+    the walk jumps between the lines containing its closer. Blocks with
+    very dense openers are walked line by line over the stripped lines
+    instead. Returns (total, blank, comments, code, state) so state carries
+    over to the next block.
+    """
+    stripped = list(map(str.strip, block.split('\n')))
+    total_lines = len(stripped)
+    blank_lines = stripped.count('')
+    
+    if state is None and not any(marker in block for marker in syntax.state_markers):
+        code_lines = (total_lines - blank_lines
+                      - sum(map(str.startswith, stripped, repeat(syntax.comment_prefixes))))
+        return (total_lines, blank_lines, total_lines - blank_lines - code_lines,
+                code_lines, None)
+    
+    # Estimate how dense possible openers are from the start of the block, as
+    # counting them over all of it costs as much as the walk would save
+    sample_end = min(len(block), DENSITY_SAMPLE_SIZE)
+    markers = sum(block.count(marker, 0, sample_end) for marker in syntax.state_markers)
+    code_lines = 0
+    if markers * BULK_MIN_RUN > block.count('\n', 0, sample_end) + 1:
+        # Openers too dense for runs to pay off: walk the stripped lines instead
+        comment_prefixes = syntax.comment_prefixes
+        for stripped_line in stripped:
+            if not stripped_line:
+                continue
+            if state is not None:
+                code_lines += not state[1]
+                if syntax.closes(stripped_line, state):
+                    state = None
+            else:
+                code_lines += not stripped_line.startswith(comment_prefixes)
+                state = syntax.open_state(stripped_line)
+        comment_lines = total_lines - blank_lines - code_lines
+        return total_lines, blank_lines, comment_lines, code_lines, state
+    
+    comment_prefixed = list(map(str.startswith, stripped, repeat(syntax.comment_prefixes)))
+    # Lines that may open a block comment or a multi-line string
+    candidates = set(compress(count(), map(str.startswith, stripped, repeat(syntax.block_openers))))
+    for delimiter in syntax.string_delimiters:
+        candidates.update(compress(count(), map(operator.contains, stripped, repeat(delimiter))))
+    candidates = sorted(candidates)
+    
+    # Lines containing each closer, the only ones that can end what it opened
+    closer_lines = {}
+    pos = 0
+    while pos < total_lines:
+        if state is not None:
+            closer = state[0]
+            lines = closer_lines.get(closer)
+            if lines is None:
+                lines = closer_lines[closer] = list(
+                    compress(count(), map(operator.contains, stripped, repeat(closer))))
+            next_closer = bisect_left(lines, pos)
+            while next_closer < len(lines) and not syntax.closes(stripped[lines[next_closer]], state):
+                next_closer += 1
+            end = lines[next_closer] + 1 if next_closer < len(lines) else total_lines
+            if not state[1]:
+                code_lines += (end - pos) - stripped[pos:end].count('')
+            if next_closer < len(lines):
+                state = None
+            pos = end
+            continue
+        
+        next_candidate = bisect_left(candidates, pos)
+        end = candidates[next_candidate] if next_candidate < len(candidates) else total_lines
+        code_lines += (end - pos) - stripped[pos:end].count('') - comment_prefixed[pos:end].count(True)
+        if end == total_lines:
+            break
+        
+        stripped_line = stripped[end]
+        code_lines += not comment_prefixed[end]
+        state = syntax.open_state(stripped_line)
+        pos = end + 1
+    
+    comment_lines = total_lines - blank_lines - code_lines
+    return total_lines, blank_lines, comment_lines, code_lines, state
+
+
+def count_stream_lines(read, language, timings=None):
+    """Count different types of lines read from a binary read(n) callable.
+
+    With a timings dict, seconds spent classifying are added to timings['classify'].
+    """
+    syntax = COMMENT_SYNTAX[language]
+    total_lines = 0
+    blank_lines = 0
+    comment_lines = 0
+    code_lines = 0
+    state = None
+    
+    for block in iter_stream_blocks(read):
+        if timings is not None:
+            start = time.perf_counter()
+        total, blank, comments, code, state = classify_block(block, syntax, state)
+        if timings is not None:
+            timings['classify'] += time.perf_counter() - start
+        total_lines += total
+        blank_lines += blank
+        comment_lines += comments
+        code_lines += code
+    
+    return {
+        'total': total_lines,
+        'blank': blank_lines,
+        'comments': comment_lines,
+        'code': code_lines
+    }
+
+
+def sniff_kind(head, size):
+    """Classify a file as 'binary', 'generated', 'oversized', 'minified' or 'source'.
+
+    head is the file's first SNIFF_SIZE bytes (or all of it) and size its length.
+    """
+    if b'\0' in head:
+        return 'binary'
+    if any(marker in head[:1024].lower() for marker in GENERATED_MARKERS):
+        return 'generated'
+    if size > MAX_CLASSIFIED_SIZE:
+        return 'oversized'
+    if len(head) > MINIFIED_LINE_LENGTH and len(head) / (head.count(b'\n') + 1) > MINIFIED_LINE_LENGTH:
+        return 'minified'
+    return 'source'
+
+
+def count_newlines(head, read):
+    """Count lines by newlines alone, after the already-read head."""
+    newlines = head.count(b'\n')
+    last = head[-1:]
+    while True:
+        chunk = read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        newlines += chunk.count(b'\n')
+        last = chunk[-1:]
+    return newlines + (1 if last and last != b'\n' else 0)
+
+
+def count_sniffed_lines(read, size, language, timings=None):
+    """Sniff a binary read(n) stream of size bytes, then count it accordingly.
+
+    The result carries a 'kind' from sniff_kind(). Source files are fully
+    classified; other kinds report every line as code, and binary files
+    report nothing at all.
+    """
+    head = read(SNIFF_SIZE)
+    kind = sniff_kind(head, size)
+    if kind == 'binary':
+        return {'total': 0, 'blank': 0, 'comments': 0, 'code': 0, 'kind': kind}
+    if kind != 'source':
+        total = count_newlines(head, read)
+        return {'total': total, 'blank': 0, 'comments': 0, 'code': total, 'kind': kind}
+    
+    # Hand the sniffed head back before the rest of the stream
+    def replay(n):
+        nonlocal head
+        if head:
+            data, head = head, b''
+            return data
+        return read(n)
+    
+    line_counts = count_stream_lines(replay, language, timings)
+    line_counts['kind'] = kind
+    return line_counts
+
+
+def count_file_lines(file_path, profile=False, data=None):
+    """Count different types of lines in a file.
+
+    Lives at module level so it can be sent to worker processes. With
+    profile, the result also carries a 'profile' dict: total seconds,
+    seconds spent in read() and in classification (the rest is mostly
+    decoding), and bytes read. data is the file's content when a reader
+    thread has already fetched it (see prefetch_files()).
+    """
+    try:
+        with open(file_path, 'rb') if data is None else io.BytesIO(data) as f:
+            size = os.fstat(f.fileno()).st_size if data is None else len(data)
+            language = language_for_path(file_path)
+            if not profile:
+                return count_sniffed_lines(f.read, size, language)
+
+            timings = {'read': 0.0, 'classify': 0.0, 'bytes': 0}
+
+            def timed_read(n):
+                start = time.perf_counter()
+                data = f.read(n)
+                timings['read'] += time.perf_counter() - start
+                timings['bytes'] += len(data)
+                return data
+
+            start = time.perf_counter()
+            line_counts = count_sniffed_lines(timed_read, size, language, timings)
+            timings['seconds'] = time.perf_counter() - start
+            timings['decode'] = max(0.0, timings['seconds'] - timings['read'] - timings['classify'])
+            line_counts['profile'] = timings
+            return line_counts
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}", file=sys.stderr)
+        return {'total': 0, 'blank': 0, 'comments': 0, 'code': 0, 'kind': 'source'}
+
+
+def read_file_bytes(file_path):
+    """Return a file's content for the counting stage, or None to have it stream the file.
+
+    Files over IO_PREFETCH_LIMIT, and files that cannot be read (the
+    counting stage then reports the error), come back as None.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > IO_PREFETCH_LIMIT:
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+
+def prefetch_files(paths, threads):
+    """Yield (file_path, content or None) in order, reading ahead on threads.
+
+    At most threads * IO_QUEUE_DEPTH reads are outstanding, so on
+    high-latency storage the link stays busy while memory stays bounded.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = deque((path, pool.submit(read_file_bytes, path))
+                        for path in islice(paths, threads * IO_QUEUE_DEPTH))
+        while pending:
+            path, future = pending.popleft()
+            for next_path in islice(paths, 1):
+                pending.append((next_path, pool.submit(read_file_bytes, next_path)))
+            yield path, future.result()
+
+
+def hash_file(file_path):
+    """Return a file's git blob id (its content hash, as `git hash-object` computes it), or None."""
+    import hashlib
+    try:
+        with open(file_path, 'rb') as f:
+            digest = hashlib.sha1(b'blob %d\0' % os.fstat(f.fileno()).st_size)
+            while chunk := f.read(READ_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+def count_file_batch(batch, profile=False):
+    """Count a list of (file_path, content or None) in a worker process."""
+    return [count_file_lines(file_path, profile, data) for file_path, data in batch]
+
+
+def count_blob_batch(batch):
+    """Count a list of (language, content) git blobs in a worker process."""
+    return [count_sniffed_lines(io.BytesIO(data).read, len(data), language)
+            for language, data in batch]
+
+
+def load_json_cache(cache_file, key):
+    """Return the entries stored under key in a JSON cache file.
+
+    Missing files, files written by another CACHE_VERSION and unreadable
+    files all give an empty dict.
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == CACHE_VERSION:
+            return data.get(key, {})
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable cache {cache_file}: {e}")
+    return {}
+
+
+def save_json_cache(cache_file, key, entries, limit=None):
+    """Atomically write entries under key to a JSON cache file.
+
+    Entries are kept least recently used first (see touch_cache_entries()),
+    so with a limit only the last limit entries are written.
+    """
+    if limit is not None and len(entries) > limit:
+        entries = dict(list(entries.items())[-limit:])
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, key: entries}, f, separators=(',', ':'))
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        print(f"⚠️  Could not save cache {cache_file}: {e}")
+
+
+def touch_cache_entries(entries, keys):
+    """Move the keys found in entries to the end, as most recently used; return how many were found."""
+    found = 0
+    for key in keys:
+        if key in entries:
+            entries[key] = entries.pop(key)
+            found += 1
+    return found
+
+
+# Extension -> id, shared by every DirectoryStats in this process
+EXTENSION_IDS = {}
+EXTENSION_NAMES = []
+
+
+def extension_id(ext):
+    """Return the process-wide interned id of a file extension."""
+    ext_id = EXTENSION_IDS.get(ext)
+    if ext_id is None:
+        ext_id = EXTENSION_IDS[ext] = len(EXTENSION_NAMES)
+        EXTENSION_NAMES.append(ext)
+    return ext_id
+
+
+class DirectoryStats:
+    """Totals for one root directory (or group of files).
+
+    The five counters sit in __slots__ and the per-extension file counts
+    in one array indexed by extension_id(), instead of a dict of ints plus
+    a defaultdict per directory. Reads by name (stats['lines'],
+    stats['file_types']) work as they did with the plain dicts. Instances
+    pickle by extension name, so totals built in another process can be
+    merge()d into this one's.
+    """
+
+    __slots__ = HISTORY_METRICS + ('ext_files',)
+
+    def __init__(self):
+        self.files = self.lines = self.code_lines = self.comment_lines = self.blank_lines = 0
+        self.ext_files = array('q')
+
+    def add(self, total, blank, comments, code, ext_id, sign=1):
+        """Add (or with sign=-1, remove) one file's counts."""
+        self.files += sign
+        self.lines += sign * total
+        self.blank_lines += sign * blank
+        self.comment_lines += sign * comments
+        self.code_lines += sign * code
+        ext_files = self.ext_files
+        if ext_id >= len(ext_files):
+            ext_files.extend(repeat(0, ext_id + 1 - len(ext_files)))
+        ext_files[ext_id] += sign
+
+    def add_totals(self, files, total, blank, comments, code, ext_id):
+        """Add the combined counts of several files of one extension, e.g. estimated ones."""
+        self.files += files
+        self.lines += total
+        self.blank_lines += blank
+        self.comment_lines += comments
+        self.code_lines += code
+        ext_files = self.ext_files
+        if ext_id >= len(ext_files):
+            ext_files.extend(repeat(0, ext_id + 1 - len(ext_files)))
+        ext_files[ext_id] += files
+
+    def merge(self, other, sign=1):
+        """Add (or with sign=-1, subtract) another DirectoryStats' totals."""
+        self.files += sign * other.files
+        self.lines += sign * other.lines
+        self.blank_lines += sign * other.blank_lines
+        self.comment_lines += sign * other.comment_lines
+        self.code_lines += sign * other.code_lines
+        ext_files = self.ext_files
+        if len(other.ext_files) > len(ext_files):
+            ext_files.extend(repeat(0, len(other.ext_files) - len(ext_files)))
+        for ext_id, count in enumerate(other.ext_files):
+            if count:
+                ext_files[ext_id] += sign * count
+        return self
+
+    @property
+    def file_types(self):
+        """Files per extension, as a dict without zero entries."""
+        return {EXTENSION_NAMES[ext_id]: count
+                for ext_id, count in enumerate(self.ext_files) if count}
+
+    def __getitem__(self, name):
+        if name not in HISTORY_METRICS and name != 'file_types':
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def to_dict(self):
+        """Return the totals as a JSON-ready dict."""
+        return {**{metric: getattr(self, metric) for metric in HISTORY_METRICS},
+                'file_types': self.file_types}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild totals saved with to_dict()."""
+        stats = cls()
+        for metric in HISTORY_METRICS:
+            setattr(stats, metric, data[metric])
+        for ext, count in data['file_types'].items():
+            ext_id = extension_id(ext)
+            stats.ext_files.extend(repeat(0, max(0, ext_id + 1 - len(stats.ext_files))))
+            stats.ext_files[ext_id] = count
+        return stats
+
+    def __reduce__(self):
+        return DirectoryStats.from_dict, (self.to_dict(),)
+
+    def __repr__(self):
+        return f"DirectoryStats({self.to_dict()})"
+
+
+class FileTable:
+    """Per-file counts of one run, stored column-wise for in-memory group-bys.
+
+    Row i is one file: paths[i] is its path relative to the root, and
+    dir_ids, ext_ids and kind_ids index the interned directories,
+    extensions and kinds lists. The line counts live in typed arrays, so
+    a large tree costs a few bytes per file per column. A file recorded
+    again (--watch) overwrites its row; a removed one is marked dead.
+    """
+
+    COUNTS = ('total', 'blank', 'comments', 'code')
+
+    def __init__(self):
+        self.paths = []
+        self.rows = {}
+        self.live = bytearray()
+        self.directories, self.dir_ids = [], array('I')
+        self.extensions, self.ext_ids = [], array('I')
+        self.kinds, self.kind_ids = [], array('B')
+        self.counts = {name: array('q') for name in self.COUNTS}
+        self.interned = ({}, {}, {})
+
+    def intern(self, which, values, value):
+        """Return the id of value in one of the interned lists, adding it if new."""
+        ids = self.interned[which]
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    def add(self, path, line_counts):
+        """Record one file's counts under its root-relative posix path."""
+        directory, _, name = path.rpartition('/')
+        row = (self.intern(0, self.directories, directory),
+               self.intern(1, self.extensions, os.path.splitext(name)[1].lower()),
+               self.intern(2, self.kinds, line_counts.get('kind', 'source')))
+        index = self.rows.get(path)
+        if index is None:
+            self.rows[path] = len(self.paths)
+            self.paths.append(path)
+            self.live.append(1)
+            self.dir_ids.append(row[0])
+            self.ext_ids.append(row[1])
+            self.kind_ids.append(row[2])
+            for name in self.COUNTS:
+                self.counts[name].append(line_counts[name])
+            return
+        self.live[index] = 1
+        self.dir_ids[index], self.ext_ids[index], self.kind_ids[index] = row
+        for name in self.COUNTS:
+            self.counts[name][index] = line_counts[name]
+
+    def remove(self, path):
+        """Mark a file's row as gone."""
+        index = self.rows.get(path)
+        if index is not None:
+            self.live[index] = 0
+
+    def __len__(self):
+        return sum(self.live)
+
+    def group_by(self, *dimensions, include_binary=False):
+        """Aggregate live rows by one or more Dimensions, in a single pass.
+
+        Returns {key: DirectoryStats}, where key is the dimension's
+        value, or a tuple of values when several dimensions are given.
+        Binary files are left out unless include_binary is set, as in the
+        directory totals.
+        """
+        columns = [dimension.row_keys(self) for dimension in dimensions]
+        keys = columns[0] if len(columns) == 1 else zip(*columns)
+        skipped = self.interned[2].get('binary') if not include_binary else None
+        ext_ids = [extension_id(ext) for ext in self.extensions]
+        groups = defaultdict(DirectoryStats)
+        for key, live, ext_id, kind_id, total, blank, comments, code in zip(
+                keys, self.live, self.ext_ids, self.kind_ids, *self.counts.values()):
+            if not live or kind_id == skipped:
+                continue
+            groups[key].add(total, blank, comments, code, ext_ids[ext_id])
+        return groups
+
+
+class Dimension:
+    """A way to group a FileTable: a key function over one of its columns.
+
+    column is 'directory' (key(dir) gets the file's directory, '' at the
+    root), 'extension' or 'path'; keys are computed once per distinct
+    directory or extension, so only path dimensions cost a call per file.
+    """
+
+    def __init__(self, name, column, key):
+        self.name = name
+        self.column = column
+        self.key = key
+
+    def row_keys(self, table):
+        """Return this dimension's key for every row of table."""
+        if self.column == 'directory':
+            keys = [self.key(directory) for directory in table.directories]
+            return [keys[i] for i in table.dir_ids]
+        if self.column == 'extension':
+            keys = [self.key(ext) for ext in table.extensions]
+            return [keys[i] for i in table.ext_ids]
+        return [self.key(path) for path in table.paths]
+
+
+def directory_dimension(depth=1):
+    """Group by the first depth directory levels; root-level files go under 'root'."""
+    def key(directory):
+        return '/'.join(directory.split('/')[:depth]) if directory else 'root'
+    return Dimension(f"dir:{depth}", 'directory', key)
+
+
+def extension_dimension():
+    """Group by file extension."""
+    return Dimension('ext', 'extension', lambda ext: ext or '(none)')
+
+
+def compile_path_pattern(pattern):
+    """Compile a CODEOWNERS/gitignore-style pattern to a regex over root-relative paths.
+
+    A pattern with a slash before its end is anchored at the root, one
+    without matches at any depth; '*' stays within a path segment and '**'
+    crosses them. A match also covers everything below a directory,
+    except after a trailing '*' (GitHub's 'docs/*' is not recursive).
+    """
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.strip('/')
+    regex = ''
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith('**/', index):
+            regex += '(?:.*/)?'
+            index += 3
+            continue
+        if pattern.startswith('**', index):
+            regex += '.*'
+            index += 2
+            continue
+        char = pattern[index]
+        regex += '[^/]*' if char == '*' else '[^/]' if char == '?' else re.escape(char)
+        index += 1
+    prefix = '' if anchored else '(?:.*/)?'
+    suffix = '' if pattern.endswith('*') else '(?:/.*)?'
+    return re.compile(prefix + regex + suffix + r'\Z')
+
+
+CODEOWNERS_LOCATIONS = ('.github/CODEOWNERS', 'CODEOWNERS', 'docs/CODEOWNERS')
+
+
+def owner_dimension(root_path, codeowners_file=None):
+    """Group by CODEOWNERS owners (the last matching rule wins), '(unowned)' if none match.
+
+    Without codeowners_file, the locations GitHub checks are tried in turn.
+    """
+    if codeowners_file is None:
+        candidates = [Path(root_path) / location for location in CODEOWNERS_LOCATIONS]
+        codeowners_file = next((path for path in candidates if path.is_file()), None)
+        if codeowners_file is None:
+            raise ValueError(f"no CODEOWNERS file found under {root_path}")
+    rules = []
+    with open(codeowners_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.split('#', 1)[0].split()
+            if fields:
+                rules.append((compile_path_pattern(fields[0]), ' '.join(fields[1:]) or '(unowned)'))
+    rules.reverse()
+
+    def key(path):
+        return next((owners for regex, owners in rules if regex.match(path)), '(unowned)')
+    return Dimension('owner', 'path', key)
+
+
+def glob_dimension(globs, default='other'):
+    """Group by labelled patterns, given as [(label, pattern), ...]; the first match wins."""
+    rules = [(label, compile_path_pattern(pattern)) for label, pattern in globs]
+
+    def key(path):
+        return next((label for label, regex in rules if regex.match(path)), default)
+    return Dimension('glob', 'path', key)
+
+
+def parse_dimensions(spec, root_path):
+    """Parse a --group-by spec such as 'dir:2+ext' into a list of Dimensions.
+
+    Parts joined with '+' are crossed. Each part is 'dir[:DEPTH]', 'ext',
+    'owner[:CODEOWNERS_FILE]' or 'glob:LABEL=PATTERN,LABEL=PATTERN,...'.
+    Raises ValueError for a malformed spec.
+    """
+    dimensions = []
+    for part in spec.split('+'):
+        name, _, arg = part.partition(':')
+        if name == 'dir':
+            if arg and not (arg.isdigit() and int(arg) > 0):
+                raise ValueError(f"directory depth must be a positive integer, not {arg!r}")
+            dimensions.append(directory_dimension(int(arg or 1)))
+        elif name == 'ext':
+            dimensions.append(extension_dimension())
+        elif name == 'owner':
+            dimensions.append(owner_dimension(root_path, arg or None))
+        elif name == 'glob':
+            globs = [item.partition('=')[::2] for item in arg.split(',') if item]
+            if not globs or not all(label and pattern for label, pattern in globs):
+                raise ValueError(f"expected glob:LABEL=PATTERN,..., not {part!r}")
+            dimensions.append(glob_dimension(globs))
+        else:
+            raise ValueError(f"unknown dimension {name!r} (expected dir, ext, owner or glob)")
+        dimensions[-1].name = part
+    return dimensions
+
+
+def run_git(args, cwd):
+    """Run a git command in cwd and return its raw stdout."""
+    import subprocess
+    result = subprocess.run(['git', *args], cwd=cwd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8', errors='replace').strip()
+                           or f"git {' '.join(args)} failed")
+    return result.stdout
+
+
+def read_git_blobs(shas, cwd):
+    """Yield (sha, size, read) for each blob, streamed through one `git cat-file --batch`.
+
+    read(n) returns the blob's bytes in pieces and is only valid until the
+    next blob is requested; whatever was not consumed is skipped.
+    """
+    import subprocess
+    import threading
+    process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=cwd,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    
+    # Feed requests from a thread so a full stdout pipe can never deadlock us
+    def feed():
+        try:
+            for sha in shas:
+                process.stdin.write(sha.encode('ascii') + b'\n')
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+    
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    try:
+        for _ in shas:
+            header = process.stdout.readline().split()
+            if len(header) == 2 and header[1] == b'missing':
+                continue
+            sha, _, size = header
+            remaining = int(size)
+            
+            def read(n):
+                nonlocal remaining
+                data = process.stdout.read(min(n, remaining))
+                remaining -= len(data)
+                return data
+            
+            yield sha.decode('ascii'), int(size), read
+            while read(READ_CHUNK_SIZE):
+                pass
+            process.stdout.read(1)  # trailing newline after each blob
+    finally:
+        process.stdout.close()
+        writer.join()
+        process.wait()
+
+
+class InotifyWatcher:
+    """Report changed paths under a tree using Linux inotify, through ctypes.
+
+    Every non-skipped directory gets a watch; directories created later are
+    added as their events arrive. Raises OSError where inotify is not
+    available (or the watch limit is reached) so callers can fall back to
+    PollingWatcher.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                  | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, root_path, should_skip_directory):
+        import ctypes
+        import ctypes.util
+        
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.ctypes = ctypes
+        self.root_path = root_path
+        self.should_skip_directory = should_skip_directory
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        self.add_tree(root_path)
+
+    def add_tree(self, dir_path):
+        """Watch a directory and every non-skipped directory below it."""
+        stack = [Path(dir_path)]
+        while stack:
+            current = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(current), self.WATCH_MASK)
+            if wd < 0:
+                errno = self.ctypes.get_errno()
+                if errno in (2, 20):  # ENOENT, ENOTDIR: it vanished meanwhile
+                    continue
+                raise OSError(errno, f"inotify_add_watch failed for {current}")
+            self.directories[wd] = current
+            try:
+                with os.scandir(current) as entries:
+                    stack.extend(Path(entry.path) for entry in entries
+                                 if entry.is_dir(follow_symlinks=False)
+                                 and not self.should_skip_directory(entry))
+            except OSError:
+                pass
+
+    def changes(self, timeout=None):
+        """Wait up to timeout seconds (forever if None) and return the changed paths.
+
+        A None entry in the result means events were lost and everything
+        should be rescanned.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 1 << 16)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+            if mask & self.IN_Q_OVERFLOW:
+                changed.add(None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+            if mask & self.IN_IGNORED:
+                del self.directories[wd]
+                continue
+            path = directory / os.fsdecode(name) if name else directory
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                if not self.should_skip_directory(path):
+                    self.add_tree(path)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Report changed paths by re-listing the tree and comparing stat signatures.
+
+    Used where inotify is unavailable; list_files() returns the current
+    code file paths.
+    """
+
+    def __init__(self, list_files, interval=WATCH_POLL_INTERVAL):
+        self.list_files = list_files
+        self.interval = interval
+        self.signatures = self.snapshot()
+
+    def snapshot(self):
+        signatures = {}
+        for file_path in self.list_files():
+            try:
+                st = file_path.stat()
+            except OSError:
+                continue
+            signatures[file_path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+        return signatures
+
+    def changes(self, timeout=None):
+        """Sleep for timeout seconds (the poll interval if None) and return the changed paths."""
+        time.sleep(self.interval if timeout is None else timeout)
+        signatures = self.snapshot()
+        changed = {path for path, signature in signatures.items()
+                   if self.signatures.get(path) != signature}
+        changed.update(path for path in self.signatures if path not in signatures)
+        self.signatures = signatures
+        return changed
+
+    def close(self):
+        pass
+
+
 class CodebaseAnalyzer:
-    def __init__(self, root_path="."):
+    def __init__(self, root_path=".", jobs=None, use_cache=True, git_rev=None, since_rev=None,
+                 io_threads=0, estimate_rate=None):
         self.root_path = Path(root_path).resolve()
-        self.stats = defaultdict(lambda: {
-            'files': 0,
-            'lines': 0,
-            'blank_lines': 0,
-            'comment_lines': 0,
-            'code_lines': 0,
-            'file_types': defaultdict(int)
-        })
+        # Number of worker processes used for line counting (1 = serial)
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        # Reader threads that fetch files ahead of the counters (0 = counters read)
+        self.io_threads = max(0, io_threads or 0)
+        
+        # Per-file count cache, keyed by relative path and validated by stat
+        self.use_cache = use_cache
+        self.cache_file = self.root_path / "reports" / ".analyzer-cache" / "file_counts.json"
+        self.cache = {}
+        self.fresh_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Worker pool shared while worker_pool() is open (started on first use),
+        # and a per-file record callback
+        self.executor = None
+        self.keep_pool = False
+        self.on_file = None
+        
+        # --estimate mode: share of files read, sampling seed, and the resulting
+        # sample sizes and confidence intervals (see estimate_codebase())
+        self.estimate_rate = estimate_rate
+        self.estimate_seed = None
+        self.estimate = None
+
+        # Batch mode: content counts shared by every root ("sha:language" -> counts,
+        # keyed like the --git blob cache), and files that matched one already there
+        self.content_cache = None
+        self.content_hits = 0
+
+        # --profile: per-phase timings and per-file I/O figures (see start_profile())
+        self.profile = None
+
+        # Every file recorded this run, for group_by() breakdowns beyond root directories
+        self.files = FileTable()
+        self.breakdowns = []
+
+        # --watch: per-file counts (key -> (root_dir_name, file_path, line_counts))
+        self.file_counts = None
+        
+        # Files the sniffer skipped or only counted newlines for, by kind
+        self.sniffed_files = defaultdict(list)
+        
+        # Filesystem calls made by the walk and the cache checks, reported after each run
+        self.walk_stats = {'directories': 0, 'entries': 0, 'stat_calls': 0}
+        
+        # --git mode: count the blobs of a revision instead of the working tree
+        self.git_rev = git_rev
+        # git_rev resolved to a commit id once per run, so history and reports
+        # name the commit that was counted rather than a moving ref like HEAD
+        self.git_commit = None
+        self.blob_cache_file = self.cache_file.with_name("blob_counts.json")
+        
+        # --since mode: git_rev's totals as since_rev's baseline plus the diff between them
+        self.since_rev = since_rev
+        self.baseline_file = self.cache_file.with_name("baselines.json")
+        self.delta_stats = defaultdict(DirectoryStats)
+        
+        # Per-run, per-directory totals for trend queries (--history)
+        self.history_file = self.root_path / "reports" / "codebase_history.sqlite"
+        self.stats = defaultdict(DirectoryStats)
         
         # Common file extensions to analyze
         self.code_extensions = {
@@ -47,97 +1210,1040 @@ class CodebaseAnalyzer:
         return file_path.suffix.lower() in self.code_extensions
 
     def should_skip_directory(self, dir_path):
-        """Check if directory should be skipped."""
+        """Check if directory (a Path or os.DirEntry) should be skipped."""
         return dir_path.name.lower() in self.skip_dirs or dir_path.name.startswith('.')
 
     def count_lines_in_file(self, file_path):
         """Count different types of lines in a file."""
+        return count_file_lines(file_path, self.profile is not None)
+
+    def record_file(self, root_dir_name, file_path, line_counts):
+        """Add one file's line counts to its root directory totals.
+
+        Files the sniffer flagged are remembered by kind; binary ones are
+        left out of the totals entirely.
+        """
+        if self.on_file is not None:
+            self.on_file(self.file_record(root_dir_name, file_path, line_counts))
+        if self.file_counts is not None:
+            # --watch: a recounted file replaces its previous counts
+            self.forget_file(self.cache_key(file_path))
+            self.file_counts[self.cache_key(file_path)] = (root_dir_name, file_path, line_counts)
+        kind = line_counts.get('kind', 'source')
+        if kind != 'source':
+            self.sniffed_files[kind].append(self.cache_key(file_path))
+        self.files.add(self.cache_key(file_path), line_counts)
+        self.tally(self.stats[root_dir_name], file_path, line_counts)
+
+    def forget_file(self, key):
+        """Remove a tracked file's counts from stats (--watch only); return True if it was known."""
+        previous = self.file_counts.pop(key, None)
+        if previous is None:
+            return False
+        root_dir_name, file_path, line_counts = previous
+        self.files.remove(key)
+        self.tally(self.stats[root_dir_name], file_path, line_counts, -1)
+        kind = line_counts.get('kind', 'source')
+        if kind != 'source':
+            self.sniffed_files[kind].remove(key)
+            if not self.sniffed_files[kind]:
+                del self.sniffed_files[kind]
+        return True
+
+    def tally(self, stats, file_path, line_counts, sign=1):
+        """Add (or with sign=-1, remove) one file's counts to a directory's totals."""
+        if line_counts.get('kind', 'source') == 'binary':
+            return
+        stats.add(line_counts['total'], line_counts['blank'], line_counts['comments'],
+                  line_counts['code'], extension_id(file_path.suffix.lower()), sign)
+
+    def group_by(self, *dimensions, include_binary=False):
+        """Aggregate this run's files by Dimensions (see FileTable.group_by()).
+
+        Any number of breakdowns can be taken from one scan, e.g.
+        group_by(directory_dimension(2), extension_dimension()). Not
+        available in --since mode, which never sees unchanged files.
+        """
+        return self.files.group_by(*dimensions, include_binary=include_binary)
+
+    def add_breakdown(self, spec):
+        """Add a --group-by breakdown to the printed and JSON results."""
+        self.breakdowns.append((spec, parse_dimensions(spec, self.root_path)))
+
+    def breakdown_rows(self, dimensions):
+        """Return [(key, stats)] for one breakdown, biggest first."""
+        groups = self.group_by(*dimensions)
+        return sorted(groups.items(), key=lambda x: x[1]['lines'], reverse=True)
+
+    def is_code_name(self, name):
+        """Check a bare file name against code_extensions, without building a Path."""
+        return os.path.splitext(name)[1].lower() in self.code_extensions
+
+    def scan_directory(self, dir_path):
+        """Open an os.scandir() iterator, counting it as one directory read."""
+        self.walk_stats['directories'] += 1
+        return os.scandir(dir_path)
+
+    def discover_directory(self, dir_path, root_dir_name):
+        """Yield (root_dir_name, file_path) for code files under a directory.
+
+        Walks with os.scandir() and an explicit stack instead of recursion, so
+        deep trees cannot hit the recursion limit. DirEntry.is_file() and
+        is_dir() use the type readdir already returned, so a plain file or
+        directory costs no stat() call; only symlinks need one. Skipped
+        directories are pruned before they are opened. Files come out in
+        the same depth-first order as a recursive walk.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-            
-            total_lines = len(lines)
-            blank_lines = 0
-            comment_lines = 0
-            code_lines = 0
-            
-            # Simple comment detection (can be improved for specific languages)
-            in_multiline_comment = False
-            
-            for line in lines:
-                stripped = line.strip()
-                
-                if not stripped:
-                    blank_lines += 1
-                elif stripped.startswith('//') or stripped.startswith('#') or stripped.startswith('*'):
-                    comment_lines += 1
-                elif stripped.startswith('/*'):
-                    comment_lines += 1
-                    if not stripped.endswith('*/'):
-                        in_multiline_comment = True
-                elif in_multiline_comment:
-                    comment_lines += 1
-                    if stripped.endswith('*/'):
-                        in_multiline_comment = False
+            stack = [self.scan_directory(dir_path)]
+        except PermissionError:
+            print(f"Permission denied: {dir_path}")
+            return
+        
+        try:
+            while stack:
+                for entry in stack[-1]:
+                    self.walk_stats['entries'] += 1
+                    if entry.is_symlink():
+                        self.walk_stats['stat_calls'] += 1
+                    if entry.is_file():
+                        if self.is_code_name(entry.name):
+                            yield root_dir_name, Path(entry.path)
+                    elif entry.is_dir() and not self.should_skip_directory(entry):
+                        try:
+                            stack.append(self.scan_directory(entry.path))
+                        except PermissionError:
+                            print(f"Permission denied: {entry.path}")
+                            continue
+                        break
                 else:
-                    code_lines += 1
-            
-            return {
-                'total': total_lines,
-                'blank': blank_lines,
-                'comments': comment_lines,
-                'code': code_lines
-            }
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-            return {'total': 0, 'blank': 0, 'comments': 0, 'code': 0}
+                    stack.pop().close()
+        finally:
+            for entries in stack:
+                entries.close()
 
     def analyze_directory(self, dir_path, root_dir_name):
         """Recursively analyze a directory."""
+        self.count_files(list(self.discover_directory(dir_path, root_dir_name)))
+
+    def discover_files(self, verbose=True):
+        """List (root_dir_name, file_path) pairs for every code file in the codebase."""
+        return [pair for files in self.iter_file_batches(verbose) for pair in files]
+
+    def iter_file_batches(self, verbose=True):
+        """Yield lists of (root_dir_name, file_path) pairs, one per root directory.
+
+        Root-level files come first, then each root directory in turn, so
+        counting can start before the whole tree has been walked.
+        """
+        # One pass over the root splits it into directories and root-level files
+        root_dirs = []
+        root_files = []
+        with self.scan_directory(self.root_path) as entries:
+            for entry in entries:
+                self.walk_stats['entries'] += 1
+                if entry.is_symlink():
+                    self.walk_stats['stat_calls'] += 1
+                if entry.is_dir():
+                    if not self.should_skip_directory(entry):
+                        root_dirs.append(entry)
+                elif entry.is_file() and self.is_code_name(entry.name):
+                    root_files.append(Path(entry.path))
+        
+        if root_files:
+            if verbose:
+                print("📁 Analyzing root-level files...")
+            yield [('root', file_path) for file_path in root_files]
+        
+        for root_dir in root_dirs:
+            if verbose:
+                print(f"📁 Analyzing {root_dir.name}/...")
+            yield list(self.discover_directory(root_dir.path, root_dir.name))
+
+    def load_cache(self):
+        """Load the on-disk per-file count cache, ignoring it if missing or stale."""
+        self.cache = load_json_cache(self.cache_file, 'files') if self.use_cache else {}
+        self.fresh_cache = {}
+
+    def save_cache(self):
+        """Write entries seen in this run, dropping files that no longer exist."""
+        if self.use_cache:
+            save_json_cache(self.cache_file, 'files', self.fresh_cache)
+
+    def cache_key(self, file_path):
+        """Return the cache key for a file: its path relative to the root."""
         try:
-            for item in dir_path.iterdir():
-                if item.is_file() and self.is_code_file(item):
-                    line_counts = self.count_lines_in_file(item)
-                    self.stats[root_dir_name]['files'] += 1
-                    self.stats[root_dir_name]['lines'] += line_counts['total']
-                    self.stats[root_dir_name]['blank_lines'] += line_counts['blank']
-                    self.stats[root_dir_name]['comment_lines'] += line_counts['comments']
-                    self.stats[root_dir_name]['code_lines'] += line_counts['code']
-                    self.stats[root_dir_name]['file_types'][item.suffix.lower()] += 1
-                    
-                elif item.is_dir() and not self.should_skip_directory(item):
-                    self.analyze_directory(item, root_dir_name)
-        except PermissionError:
-            print(f"Permission denied: {dir_path}")
+            return file_path.relative_to(self.root_path).as_posix()
+        except ValueError:
+            return file_path.as_posix()
+
+    def count_files(self, files):
+        """Count lines for discovered files and merge them into stats.
+
+        Files whose path, mtime, size and inode match a cache entry are not
+        read at all. The rest are counted, fanned out to a process pool when
+        more than one job is configured; with a content_cache (batch mode),
+        only contents not counted before are. Results are merged (and
+        reported to on_file) in discovery order as they arrive, so the stats
+        are identical to a serial, uncached run.
+        """
+        cached = {}
+        pending = {}
+        for index, (_, file_path) in enumerate(files):
+            if not self.use_cache:
+                pending[index] = (file_path, None, None)
+                continue
+            key = self.cache_key(file_path)
+            try:
+                self.walk_stats['stat_calls'] += 1
+                st = file_path.stat()
+                signature = [st.st_mtime_ns, st.st_size, st.st_ino]
+            except OSError:
+                signature = None
+            entry = self.cache.get(key)
+            if signature is not None and entry is not None and entry[:3] == signature:
+                total, blank, comments, code, kind = entry[3:]
+                cached[index] = {'total': total, 'blank': blank, 'comments': comments,
+                                 'code': code, 'kind': kind}
+                self.fresh_cache[key] = entry
+                self.cache_hits += 1
+            else:
+                pending[index] = (file_path, key, signature)
+        
+        paths = [file_path for file_path, _, _ in pending.values()]
+        with self.counting(paths) as counted:
+            self.merge_counts(files, cached, pending, counted)
+
+    @contextmanager
+    def counting(self, paths):
+        """Yield an iterator over the line counts of paths, in order.
+
+        Picks the worker pool, read-ahead threads or content cache as
+        configured; small batches are counted in-process.
+        """
+        if self.jobs == 1 or len(paths) < PARALLEL_MIN_FILES:
+            pool = nullcontext()
+        elif self.executor is not None or self.keep_pool:
+            pool = nullcontext(self.pool_executor())
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=self.jobs)
+        with pool as executor:
+            if self.content_cache is not None:
+                yield self.count_by_content(paths, executor)
+            elif self.io_threads:
+                yield self.count_prefetched(paths, executor)
+            elif executor is not None:
+                yield executor.map(count_file_lines, paths, repeat(self.profile is not None),
+                                   chunksize=max(1, len(paths) // (self.jobs * 8)))
+            else:
+                yield map(self.count_lines_in_file, paths)
+
+    def count_by_content(self, paths, executor=None):
+        """Yield counts for paths in order, counting each distinct content only once.
+
+        Files are hashed first, to the same "sha:language" keys as the --git
+        blob cache; only keys missing from content_cache are then counted.
+        Copies of a file, in this root or any other of the batch, reuse
+        its counts.
+        """
+        chunksize = max(1, len(paths) // (self.jobs * 8))
+        digests = (executor.map(hash_file, paths, chunksize=chunksize) if executor is not None
+                   else map(hash_file, paths))
+        keys = [f"{sha}:{language_for_path(file_path)}" if sha else None
+                for file_path, sha in zip(paths, digests)]
+        
+        touch_cache_entries(self.content_cache, dict.fromkeys(key for key in keys if key is not None))
+        missing = {}
+        for file_path, key in zip(paths, keys):
+            if key is not None and key not in self.content_cache and key not in missing:
+                missing[key] = file_path
+        
+        profile = self.profile is not None
+        counted_paths = list(missing.values())
+        if executor is not None:
+            counts = executor.map(count_file_lines, counted_paths, repeat(profile),
+                                  chunksize=max(1, len(counted_paths) // (self.jobs * 8)))
+        else:
+            counts = map(self.count_lines_in_file, counted_paths)
+        fresh = {}
+        for key, line_counts in zip(missing, counts):
+            fresh[key] = line_counts
+            self.content_cache[key] = [line_counts['total'], line_counts['blank'],
+                                       line_counts['comments'], line_counts['code'],
+                                       line_counts['kind']]
+        
+        for file_path, key in zip(paths, keys):
+            if key is None:
+                # Unreadable: let the counter report the error
+                yield self.count_lines_in_file(file_path)
+            elif key in fresh:
+                yield fresh.pop(key)
+            else:
+                self.content_hits += 1
+                yield self.blob_line_counts(self.content_cache, key)
+
+    def count_prefetched(self, paths, executor=None):
+        """Yield counts for paths in order, with io_threads reader threads fetching ahead.
+
+        Contents go to the worker pool in batches when there is one, again
+        with only a bounded number of batches in flight, or are counted here.
+        """
+        profile = self.profile is not None
+        reads = prefetch_files(paths, self.io_threads)
+        if executor is None:
+            for file_path, data in reads:
+                yield count_file_lines(file_path, profile, data)
+            return
+        in_flight = deque()
+        batch, batch_bytes = [], 0
+        for file_path, data in reads:
+            batch.append((file_path, data))
+            batch_bytes += len(data) if data is not None else IO_BATCH_BYTES
+            if batch_bytes < IO_BATCH_BYTES and len(batch) < IO_BATCH_FILES:
+                continue
+            in_flight.append(executor.submit(count_file_batch, batch, profile))
+            batch, batch_bytes = [], 0
+            if len(in_flight) >= self.jobs * IO_QUEUE_DEPTH:
+                yield from in_flight.popleft().result()
+        if batch:
+            in_flight.append(executor.submit(count_file_batch, batch, profile))
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+    def merge_counts(self, files, cached, pending, counted):
+        """Record every file in order, taking uncached counts from the counted iterator."""
+        counted = iter(counted)
+        for index, (root_dir_name, file_path) in enumerate(files):
+            line_counts = cached.get(index)
+            if line_counts is None:
+                line_counts = next(counted)
+                _, key, signature = pending[index]
+                self.cache_misses += 1
+                if key is not None and signature is not None:
+                    self.fresh_cache[key] = signature + [
+                        line_counts['total'], line_counts['blank'], line_counts['comments'],
+                        line_counts['code'], line_counts['kind']]
+            if 'profile' in line_counts:
+                self.record_file_profile(file_path, line_counts.pop('profile'))
+            self.record_file(root_dir_name, file_path, line_counts)
+
+    def git_root_dir_name(self, file_path):
+        """Return the root directory a repository-relative path is reported under."""
+        return file_path.parts[0] if len(file_path.parts) > 1 else 'root'
+
+    def discover_git_files(self, rev=None):
+        """List (root_dir_name, relative_path, blob_sha) for code files in rev (default git_rev).
+
+        Uses `git ls-tree`, so .gitignore is honored by construction and the
+        skip_dirs heuristics are not needed.
+        """
+        output = run_git(['ls-tree', '-r', '-z', rev or self.git_commit], cwd=self.root_path)
+        files = []
+        for record in output.split(b'\0'):
+            if not record:
+                continue
+            meta, _, name = record.partition(b'\t')
+            mode, obj_type, sha = meta.split()
+            # Skip submodules and symlinks
+            if obj_type != b'blob' or mode == b'120000':
+                continue
+            file_path = Path(os.fsdecode(name))
+            if not self.is_code_file(file_path):
+                continue
+            files.append((self.git_root_dir_name(file_path), file_path, sha.decode('ascii')))
+        return files
+
+    def discover_git_changes(self):
+        """List (relative_path, old_sha, new_sha) for code files changed from since_rev to git_rev.
+
+        Uses `git diff --raw`, which lists blob ids without reading any
+        content. A side that is absent, a symlink or a submodule is None.
+        """
+        output = run_git(['diff', '--raw', '-z', '--no-renames', '--no-abbrev',
+                          self.since_rev, self.git_commit], cwd=self.root_path)
+        fields = output.split(b'\0')
+        changes = []
+        for meta, name in zip(fields[0::2], fields[1::2]):
+            old_mode, new_mode, old_sha, new_sha, _ = meta.lstrip(b':').split()
+            file_path = Path(os.fsdecode(name))
+            if not self.is_code_file(file_path):
+                continue
+            old_sha = old_sha.decode('ascii') if old_mode in GIT_FILE_MODES else None
+            new_sha = new_sha.decode('ascii') if new_mode in GIT_FILE_MODES else None
+            if old_sha or new_sha:
+                changes.append((file_path, old_sha, new_sha))
+        return changes
+
+    def load_blob_cache(self):
+        """Load blob counts from earlier --git runs ("sha:language" -> counts)."""
+        return load_json_cache(self.blob_cache_file, 'blobs') if self.use_cache else {}
+
+    def save_blob_cache(self, blobs):
+        """Persist blob counts, keeping only the most recently used entries."""
+        if self.use_cache:
+            save_json_cache(self.blob_cache_file, 'blobs', blobs, MAX_BLOB_CACHE_ENTRIES)
+
+    def count_git_blobs(self, blobs, entries):
+        """Make sure blobs holds counts for every (file_path, sha) entry.
+
+        Returns the blob cache key of each entry, in order. Only blobs not
+        counted before are read, all through one `git cat-file --batch`,
+        and counted on the worker pool when there are enough of them.
+        """
+        # Counts depend on the language as well as the content, so key on both
+        keys = [f"{sha}:{language_for_path(file_path)}" for file_path, sha in entries]
+        wanted = set(keys)
+        self.cache_hits += touch_cache_entries(blobs, wanted)
+        
+        # A blob stored under several languages is simply requested once per language
+        missing = defaultdict(list)
+        for key in wanted:
+            if key not in blobs:
+                sha, _, language = key.partition(':')
+                missing[sha].append(language)
+        shas = [sha for sha, languages in missing.items() for _ in languages]
+        for key, line_counts in self.count_blobs(shas, missing):
+            blobs[key] = [line_counts['total'], line_counts['blank'], line_counts['comments'],
+                          line_counts['code'], line_counts['kind']]
+            self.cache_misses += 1
+        return keys
+
+    def count_blobs(self, shas, languages):
+        """Yield (blob cache key, line counts) for shas, read through `git cat-file --batch`.
+
+        languages maps each sha to the languages still to count it as. With
+        several jobs, blobs up to IO_PREFETCH_LIMIT are read whole here and
+        counted on the worker pool in batches, with only a bounded number
+        of batches in flight; bigger ones are streamed and counted here.
+        """
+        blobs = read_git_blobs(shas, cwd=self.root_path)
+        if self.jobs == 1 or len(shas) < PARALLEL_MIN_FILES:
+            for sha, size, read in blobs:
+                language = languages[sha].pop()
+                yield f"{sha}:{language}", count_sniffed_lines(read, size, language)
+            return
+        
+        with self.worker_pool():
+            executor = self.pool_executor()
+            in_flight = deque()
+            keys, batch, batch_bytes = [], [], 0
+            for sha, size, read in blobs:
+                language = languages[sha].pop()
+                if size > IO_PREFETCH_LIMIT:
+                    yield f"{sha}:{language}", count_sniffed_lines(read, size, language)
+                    continue
+                keys.append(f"{sha}:{language}")
+                batch.append((language, read(size)))
+                batch_bytes += size
+                if batch_bytes < IO_BATCH_BYTES and len(batch) < IO_BATCH_FILES:
+                    continue
+                in_flight.append((keys, executor.submit(count_blob_batch, batch)))
+                keys, batch, batch_bytes = [], [], 0
+                if len(in_flight) >= self.jobs * IO_QUEUE_DEPTH:
+                    batch_keys, future = in_flight.popleft()
+                    yield from zip(batch_keys, future.result())
+            if batch:
+                in_flight.append((keys, executor.submit(count_blob_batch, batch)))
+            while in_flight:
+                batch_keys, future = in_flight.popleft()
+                yield from zip(batch_keys, future.result())
+
+    def blob_line_counts(self, blobs, key):
+        """Return the line counts cached for a blob key, or None if it could not be read."""
+        if key not in blobs:
+            return None
+        total, blank, comments, code, kind = blobs[key]
+        return {'total': total, 'blank': blank, 'comments': comments, 'code': code, 'kind': kind}
+
+    def analyze_git_revision(self):
+        """Count every code blob in git_rev, reading only blobs not seen before."""
+        files = self.discover_git_files()
+        blobs = self.load_blob_cache()
+        keys = self.count_git_blobs(blobs, [(file_path, sha) for _, file_path, sha in files])
+        
+        for (root_dir_name, file_path, _), key in zip(files, keys):
+            line_counts = self.blob_line_counts(blobs, key)
+            if line_counts is not None:
+                self.record_file(root_dir_name, file_path, line_counts)
+        
+        self.save_blob_cache(blobs)
+        print(f"🧬 Git blobs: {len(set(keys)):,} unique, {self.cache_hits:,} reused, "
+              f"{self.cache_misses:,} counted")
+
+    def load_baselines(self):
+        """Load cached per-directory totals of earlier --since base trees (tree sha -> stats)."""
+        return load_json_cache(self.baseline_file, 'trees') if self.use_cache else {}
+
+    def save_baselines(self, baselines):
+        """Persist base tree totals, keeping only the most recently used ones."""
+        if self.use_cache:
+            save_json_cache(self.baseline_file, 'trees', baselines, MAX_BASELINES)
+
+    def git_baseline(self, blobs):
+        """Return per-directory totals for since_rev, counted once per tree and then cached."""
+        tree = run_git(['rev-parse', f"{self.since_rev}^{{tree}}"],
+                       cwd=self.root_path).decode('ascii').strip()
+        baselines = self.load_baselines()
+        baseline = baselines.pop(tree, None)
+        if baseline is not None:
+            print(f"♻️  Baseline: reusing totals for {self.since_rev} (tree {tree[:12]})")
+        else:
+            print(f"📁 Counting baseline {self.since_rev} (tree {tree[:12]})...")
+            files = self.discover_git_files(self.since_rev)
+            keys = self.count_git_blobs(blobs, [(file_path, sha) for _, file_path, sha in files])
+            stats = defaultdict(DirectoryStats)
+            for (root_dir_name, file_path, _), key in zip(files, keys):
+                line_counts = self.blob_line_counts(blobs, key)
+                if line_counts is not None:
+                    self.tally(stats[root_dir_name], file_path, line_counts)
+            baseline = {dir_name: dir_stats.to_dict() for dir_name, dir_stats in stats.items()}
+        baselines[tree] = baseline
+        self.save_baselines(baselines)
+        return baseline
+
+    def analyze_git_delta(self):
+        """Compute git_rev's totals as since_rev's baseline plus the changed files only.
+
+        Work is proportional to the diff: the baseline is cached by tree, the
+        changed paths come from `git diff --raw`, and each changed blob is
+        counted at most once thanks to the blob cache. The per-directory
+        differences are kept in delta_stats.
+        """
+        blobs = self.load_blob_cache()
+        for dir_name, dir_stats in self.git_baseline(blobs).items():
+            self.stats[dir_name].merge(DirectoryStats.from_dict(dir_stats))
+        
+        changes = self.discover_git_changes()
+        entries = [(file_path, sha) for file_path, old_sha, new_sha in changes
+                   for sha in (old_sha, new_sha) if sha]
+        keys = iter(self.count_git_blobs(blobs, entries))
+        
+        for file_path, old_sha, new_sha in changes:
+            root_dir_name = self.git_root_dir_name(file_path)
+            delta = DirectoryStats()
+            for sha, sign in ((old_sha, -1), (new_sha, 1)):
+                if not sha:
+                    continue
+                line_counts = self.blob_line_counts(blobs, next(keys))
+                if line_counts is None:
+                    continue
+                self.tally(self.stats[root_dir_name], file_path, line_counts, sign)
+                self.tally(self.delta_stats[root_dir_name], file_path, line_counts, sign)
+                self.tally(delta, file_path, line_counts, sign)
+            if self.on_file is not None:
+                change = 'added' if not old_sha else 'deleted' if not new_sha else 'modified'
+                self.on_file({'type': 'file_delta', 'path': file_path.as_posix(),
+                              'directory': root_dir_name, 'change': change,
+                              **{metric: delta[metric] for metric in HISTORY_METRICS}})
+        
+        self.save_blob_cache(blobs)
+        print(f"🧬 Diff: {len(changes):,} code files changed since {self.since_rev}, "
+              f"{self.cache_hits:,} blobs reused, {self.cache_misses:,} counted")
+
+    def watch_root_dir_name(self, path):
+        """Return the root directory a changed path belongs to, or None if it is not counted.
+
+        A directory directly in the root is its own root directory; only
+        files directly in the root belong to 'root'.
+        """
+        try:
+            relative = path.relative_to(self.root_path)
+        except ValueError:
+            return None
+        if not relative.parts or any(self.should_skip_directory(Path(part))
+                                     for part in relative.parts[:-1]):
+            return None
+        if len(relative.parts) > 1 or path.is_dir():
+            return relative.parts[0]
+        return 'root'
+
+    def apply_changes(self, paths):
+        """Recount changed files and drop removed ones, updating stats in place.
+
+        Paths may be files or directories; a directory stands for
+        everything below it.
+        """
+        before = sum(stats['lines'] for stats in self.stats.values())
+        files = {}
+        removed = 0
+        for path in paths:
+            root_dir_name = self.watch_root_dir_name(path)
+            if root_dir_name is None:
+                continue
+            if path.is_dir():
+                if self.should_skip_directory(path):
+                    continue
+                for pair in self.discover_directory(path, root_dir_name):
+                    files[pair[1]] = pair
+            elif path.is_file():
+                if self.is_code_file(path):
+                    files[path] = (root_dir_name, path)
+            else:
+                # Gone: the file itself, or everything under a removed directory
+                key = self.cache_key(path)
+                gone = [tracked for tracked in self.file_counts
+                        if tracked == key or tracked.startswith(key + '/')]
+                for tracked in gone:
+                    self.forget_file(tracked)
+                    self.fresh_cache.pop(tracked, None)
+                removed += len(gone)
+        
+        if not files and not removed:
+            return
+        self.cache_hits = self.cache_misses = 0
+        self.count_files(list(files.values()))
+        self.save_cache()
+        after = sum(stats['lines'] for stats in self.stats.values())
+        print(f"🔄 {datetime.now().strftime('%H:%M:%S')} {len(files):,} files recounted "
+              f"({self.cache_misses:,} changed), {removed:,} removed: "
+              f"{after:,} lines ({after - before:+,})")
+
+    def watch(self, poll=False):
+        """Scan once, then keep stats current as files change, until interrupted.
+
+        Uses inotify where available and falls back to polling. Bursts of
+        events (a branch checkout, a formatter run) are debounced into one
+        batch, recounted together.
+        """
+        self.file_counts = {}
+        self.analyze_codebase()
+        
+        watcher = None
+        if not poll:
+            try:
+                watcher = InotifyWatcher(self.root_path, self.should_skip_directory)
+                print(f"👀 Watching {len(watcher.directories):,} directories with inotify "
+                      f"(Ctrl+C to stop)")
+            except OSError as e:
+                print(f"⚠️  inotify unavailable ({e}); falling back to polling")
+        if watcher is None:
+            watcher = PollingWatcher(
+                lambda: [file_path for _, file_path in self.discover_files(verbose=False)])
+            print(f"👀 Polling every {watcher.interval:g}s (Ctrl+C to stop)")
+        
+        with self.worker_pool(), closing(watcher):
+            while True:
+                changed = watcher.changes()
+                deadline = time.monotonic() + WATCH_MAX_DELAY
+                while time.monotonic() < deadline:
+                    more = watcher.changes(WATCH_DEBOUNCE)
+                    if not more:
+                        break
+                    changed |= more
+                if None in changed:
+                    # The kernel dropped events: rescan the whole tree
+                    changed = {self.root_path / key for key in self.file_counts}
+                    changed.update(file_path for _, file_path in self.discover_files(verbose=False))
+                self.apply_changes(changed)
+
+    @contextmanager
+    def worker_pool(self):
+        """Share one worker pool between count_files() calls while open.
+
+        The pool is only started by the first batch big enough to need it
+        (see pool_executor()). A pool already set in self.executor (batch
+        mode) is used as is and left running.
+        """
+        if self.executor is not None or self.keep_pool:
+            yield
+            return
+        self.keep_pool = True
+        try:
+            yield
+        finally:
+            self.keep_pool = False
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def pool_executor(self):
+        """Return the shared worker pool, starting it if needed."""
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return self.executor
 
     def analyze_codebase(self):
         """Analyze the entire codebase."""
         print(f"🔍 Analyzing codebase at: {self.root_path}")
         print("=" * 60)
         
-        # Get root-level directories
-        root_dirs = [d for d in self.root_path.iterdir() 
-                    if d.is_dir() and not self.should_skip_directory(d)]
+        if self.git_rev:
+            self.git_commit = run_git(['rev-parse', '--verify', f"{self.git_rev}^{{commit}}"],
+                                      cwd=self.root_path).decode('ascii').strip()
         
-        # Also analyze root-level files
-        root_files = [f for f in self.root_path.iterdir() 
-                     if f.is_file() and self.is_code_file(f)]
+        if self.since_rev:
+            print(f"📁 Analyzing git revision {self.git_rev} against {self.since_rev}...")
+            with self.phase('git'), self.worker_pool():
+                self.analyze_git_delta()
+            return
         
-        if root_files:
-            print("📁 Analyzing root-level files...")
-            for file_path in root_files:
-                line_counts = self.count_lines_in_file(file_path)
-                self.stats['root']['files'] += 1
-                self.stats['root']['lines'] += line_counts['total']
-                self.stats['root']['blank_lines'] += line_counts['blank']
-                self.stats['root']['comment_lines'] += line_counts['comments']
-                self.stats['root']['code_lines'] += line_counts['code']
-                self.stats['root']['file_types'][file_path.suffix.lower()] += 1
-        
-        # Analyze each root directory
-        for root_dir in root_dirs:
-            print(f"📁 Analyzing {root_dir.name}/...")
-            self.analyze_directory(root_dir, root_dir.name)
+        if self.git_rev:
+            print(f"📁 Analyzing git revision {self.git_rev}...")
+            with self.phase('git'), self.worker_pool():
+                self.analyze_git_revision()
+            return
+        
+        if self.estimate_rate:
+            self.estimate_codebase()
+            return
+        
+        # Count each root directory as soon as it is walked, sharing one worker pool
+        with self.phase('cache'):
+            self.load_cache()
+        batches = self.iter_file_batches()
+        with self.worker_pool():
+            while True:
+                with self.phase('walk'):
+                    files = next(batches, None)
+                if files is None:
+                    break
+                with self.phase('count'):
+                    self.count_files(files)
+        with self.phase('cache'):
+            self.save_cache()
+        
+        walk = self.walk_stats
+        print(f"🚶 Walk: {walk['directories']:,} directories read, {walk['entries']:,} entries, "
+              f"{walk['stat_calls']:,} stat calls")
+        if self.use_cache:
+            print(f"♻️  Cache: {self.cache_hits:,} files reused, {self.cache_misses:,} counted")
+        if self.content_cache is not None:
+            print(f"🧬 Content: {self.content_hits:,} files matched content counted before")
+
+    def estimate_codebase(self):
+        """Estimate totals from a stratified random sample instead of reading every file.
+
+        Every file is enumerated and stat()ed, but each (root directory,
+        extension) stratum only has estimate_rate of its files read, and at
+        least MIN_STRATUM_SAMPLES. Line totals are extrapolated with a ratio
+        estimator on file size (the sample's lines per byte times the
+        stratum's bytes), and the file count (binary files are left out)
+        from the sample mean. Estimates go to stats; sample sizes and
+        confidence intervals to self.estimate.
+        """
+        import math
+        import random
+        strata = defaultdict(list)
+        with self.phase('walk'):
+            for files in self.iter_file_batches():
+                for root_dir_name, file_path in files:
+                    try:
+                        self.walk_stats['stat_calls'] += 1
+                        size = file_path.stat().st_size
+                    except OSError:
+                        continue
+                    strata[root_dir_name, file_path.suffix.lower()].append((file_path, size))
+        
+        rng = random.Random(self.estimate_seed)
+        samples = {}
+        for stratum, entries in strata.items():
+            wanted = max(MIN_STRATUM_SAMPLES, math.ceil(self.estimate_rate * len(entries)))
+            samples[stratum] = rng.sample(entries, min(len(entries), wanted))
+        paths = [file_path for sample in samples.values() for file_path, _ in sample]
+        with self.phase('count'), self.worker_pool(), self.counting(paths) as counted:
+            counts = iter(list(counted))
+        
+        metrics = {'lines': 'total', 'code_lines': 'code', 'comment_lines': 'comments',
+                   'blank_lines': 'blank'}
+        totals = dict.fromkeys(HISTORY_METRICS, 0.0)
+        variances = dict.fromkeys(HISTORY_METRICS, 0.0)
+        for (root_dir_name, ext), entries in strata.items():
+            sample = samples[root_dir_name, ext]
+            observed = [next(counts) for _ in sample]
+            for file_path, line_counts in zip(sample, observed):
+                if 'profile' in line_counts:
+                    self.record_file_profile(file_path[0], line_counts.pop('profile'))
+            population, size = len(entries), len(sample)
+            sizes = [file_size for _, file_size in sample]
+            stratum_bytes = sum(file_size for _, file_size in entries)
+            counted_files = [line_counts.get('kind', 'source') != 'binary' for line_counts in observed]
+            values = {'files': [int(kept) for kept in counted_files]}
+            for metric, key in metrics.items():
+                values[metric] = [line_counts[key] if kept else 0
+                                  for line_counts, kept in zip(observed, counted_files)]
+            
+            estimate = {}
+            for metric, ys in values.items():
+                if metric != 'files' and sum(sizes):
+                    ratio = sum(ys) / sum(sizes)
+                    estimate[metric] = ratio * stratum_bytes
+                    residuals = [y - ratio * x for y, x in zip(ys, sizes)]
+                else:
+                    mean = sum(ys) / size
+                    estimate[metric] = mean * population
+                    residuals = [y - mean for y in ys]
+                totals[metric] += estimate[metric]
+                # Variance of the stratum total, with the finite population correction
+                if 1 < size < population:
+                    variances[metric] += (population ** 2 * (1 - size / population)
+                                          * sum(r * r for r in residuals) / (size - 1) / size)
+            
+            # Record the stratum as round(files) files of this extension
+            self.stats[root_dir_name].add_totals(
+                round(estimate['files']), round(estimate['lines']), round(estimate['blank_lines']),
+                round(estimate['comment_lines']), round(estimate['code_lines']), extension_id(ext))
+        
+        enumerated = sum(len(entries) for entries in strata.values())
+        total_bytes = sum(file_size for entries in strata.values() for _, file_size in entries)
+        sampled_bytes = sum(file_size for sample in samples.values() for _, file_size in sample)
+        self.estimate = {
+            'rate': self.estimate_rate,
+            'confidence': 0.95,
+            'strata': len(strata),
+            'files_enumerated': enumerated,
+            'files_sampled': len(paths),
+            'bytes_total': total_bytes,
+            'bytes_sampled': sampled_bytes,
+            'totals': {metric: {'value': round(totals[metric]),
+                                'low': max(0, round(totals[metric] - ESTIMATE_Z * math.sqrt(variances[metric]))),
+                                'high': round(totals[metric] + ESTIMATE_Z * math.sqrt(variances[metric]))}
+                       for metric in HISTORY_METRICS},
+        }
+        print(f"🎲 Sampled {len(paths):,} of {enumerated:,} files in {len(strata):,} strata "
+              f"({sampled_bytes / total_bytes * 100 if total_bytes else 0:.1f}% of bytes read)")
+
+    def print_estimate(self):
+        """Print the --estimate totals with their confidence intervals."""
+        estimate = self.estimate
+        print(f"\n🎲 ESTIMATED TOTALS ({estimate['confidence']:.0%} confidence intervals, "
+              f"{estimate['files_sampled']:,} of {estimate['files_enumerated']:,} files read):")
+        labels = {'files': '📄 Files', 'lines': '📏 Lines', 'code_lines': '💻 Code Lines',
+                  'comment_lines': '💬 Comment Lines', 'blank_lines': '⚪ Blank Lines'}
+        for metric, label in labels.items():
+            total = estimate['totals'][metric]
+            print(f"   {label}: {total['value']:,} (±{(total['high'] - total['value']):,}; "
+                  f"{total['low']:,} – {total['high']:,})")
+
+    def start_profile(self, top_files=10):
+        """Turn on profiling; results accumulate in self.profile.
+
+        self.profile holds:
+          'phases': name -> {'wall': seconds, 'cpu': seconds} (cpu is this
+                    process only, so worker time shows up under 'files')
+          'files': totals over counted files: count, bytes, seconds, read,
+                   decode and classify seconds (summed across workers)
+          'extensions': ext -> {'files', 'bytes', 'seconds'}
+          'slowest_files': the top_files slowest counts (see profile_report())
+        """
+        self.profile = {
+            'phases': {},
+            'files': {'count': 0, 'bytes': 0, 'seconds': 0.0, 'read': 0.0,
+                      'decode': 0.0, 'classify': 0.0},
+            'extensions': {},
+            'slowest_files': [],
+        }
+        self.profile_top_files = top_files
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the run into self.profile (a no-op unless profiling)."""
+        if self.profile is None:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            timing = self.profile['phases'].setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+            timing['wall'] += time.perf_counter() - wall
+            timing['cpu'] += time.process_time() - cpu
+
+    def record_file_profile(self, file_path, timings):
+        """Fold one file's counting timings into self.profile."""
+        files = self.profile['files']
+        files['count'] += 1
+        for metric in ('bytes', 'seconds', 'read', 'decode', 'classify'):
+            files[metric] += timings[metric]
+
+        extension = self.profile['extensions'].setdefault(
+            file_path.suffix.lower(), {'files': 0, 'bytes': 0, 'seconds': 0.0})
+        extension['files'] += 1
+        extension['bytes'] += timings['bytes']
+        extension['seconds'] += timings['seconds']
+
+        # Min-heap of the slowest files seen so far
+        slowest = self.profile['slowest_files']
+        entry = (timings['seconds'], self.cache_key(file_path), timings['bytes'])
+        if len(slowest) < self.profile_top_files:
+            heapq.heappush(slowest, entry)
+        elif entry > slowest[0]:
+            heapq.heapreplace(slowest, entry)
+
+    def profile_report(self):
+        """Return self.profile with the slowest files sorted and spelled out."""
+        return {
+            **self.profile,
+            'slowest_files': [{'path': path, 'seconds': seconds, 'bytes': size}
+                              for seconds, path, size in sorted(self.profile['slowest_files'],
+                                                                reverse=True)],
+        }
+
+    def print_profile(self):
+        """Print where the run spent its time."""
+        report = self.profile_report()
+        print("\n⏱️  PROFILE:")
+        print("-" * 60)
+        print(f"{'Phase':<12} {'Wall (s)':>10} {'CPU (s)':>10}")
+        for name, timing in report['phases'].items():
+            print(f"{name:<12} {timing['wall']:>10.3f} {timing['cpu']:>10.3f}")
+
+        files = report['files']
+        megabytes = files['bytes'] / (1024 * 1024)
+        print(f"\n📥 Counted {files['count']:,} files, {megabytes:.1f} MB read "
+              f"(summed over workers): read {files['read']:.3f}s, decode {files['decode']:.3f}s, "
+              f"classify {files['classify']:.3f}s")
+
+        print(f"\n{'Extension':<12} {'Files':>8} {'MB':>10} {'Seconds':>10}")
+        for ext, stats in sorted(report['extensions'].items(), key=lambda x: x[1]['seconds'],
+                                 reverse=True):
+            print(f"{ext or '(none)':<12} {stats['files']:>8,} {stats['bytes'] / (1024 * 1024):>10.2f} "
+                  f"{stats['seconds']:>10.3f}")
+
+        if report['slowest_files']:
+            print(f"\n🐢 Slowest {len(report['slowest_files'])} files:")
+            for slow in report['slowest_files']:
+                print(f"   {slow['seconds']:>8.3f}s {slow['bytes'] / 1024:>10,.0f} KB  {slow['path']}")
+        print("-" * 60)
+
+    def open_history(self):
+        """Open the history database, creating it and its schema if needed."""
+        import sqlite3
+        self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.history_file)
+        connection.executescript(HISTORY_SCHEMA)
+        return connection
+
+    def save_history(self):
+        """Append this run's overall and per-directory totals to the history store."""
+        if self.estimate is not None:
+            print("🗃️  History: estimates are not recorded")
+            return
+        with self.phase('history'):
+            self.write_history()
+
+    def write_history(self):
+        """Insert this run into the history store and prune old runs."""
+        import sqlite3
+        totals = {metric: sum(stats[metric] for stats in self.stats.values())
+                  for metric in HISTORY_METRICS}
+        try:
+            with closing(self.open_history()) as connection, connection:
+                run_id = connection.execute(
+                    "INSERT INTO runs (timestamp, revision, files, lines, code_lines, "
+                    "comment_lines, blank_lines) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (datetime.now().isoformat(timespec='seconds'), self.git_commit,
+                     *(totals[metric] for metric in HISTORY_METRICS))).lastrowid
+                connection.executemany(
+                    "INSERT INTO directory_totals (directory, run_id, files, lines, code_lines, "
+                    "comment_lines, blank_lines) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(dir_name, run_id, *(stats[metric] for metric in HISTORY_METRICS))
+                     for dir_name, stats in self.stats.items() if stats['files'] > 0])
+                
+                # Keep the store bounded: drop everything older than the newest runs
+                cutoff = run_id - MAX_HISTORY_RUNS
+                connection.execute("DELETE FROM directory_totals WHERE run_id <= ?", (cutoff,))
+                connection.execute("DELETE FROM runs WHERE id <= ?", (cutoff,))
+            print(f"🗃️  History: run recorded in {self.history_file}")
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not record history in {self.history_file}: {e}")
+
+    def query_history(self, directory=None):
+        """Return totals for every recorded run in this run's series, oldest first.
+
+        Working-tree runs and git revision runs (--git/--since) form separate
+        series, so totals over different file sets are never compared. With a
+        directory, reads that directory's rows through the (directory, run_id)
+        primary key; otherwise reads the overall totals.
+        """
+        if not self.history_file.exists():
+            return []
+        series = "revision IS NOT NULL" if self.git_rev else "revision IS NULL"
+        if directory is None:
+            columns = ', '.join(HISTORY_METRICS)
+            query = f"SELECT timestamp, revision, {columns} FROM runs WHERE {series} ORDER BY id"
+            params = ()
+        else:
+            columns = ', '.join(f"d.{metric}" for metric in HISTORY_METRICS)
+            query = (f"SELECT r.timestamp, r.revision, {columns} FROM directory_totals d "
+                     f"JOIN runs r ON r.id = d.run_id WHERE d.directory = ? AND r.{series} "
+                     f"ORDER BY d.run_id")
+            params = (directory,)
+        import sqlite3
+        with closing(sqlite3.connect(self.history_file)) as connection:
+            rows = connection.execute(query, params).fetchall()
+        return [dict(zip(('timestamp', 'revision') + HISTORY_METRICS, row)) for row in rows]
+
+    def print_history(self, directory=None):
+        """Print lines over time for one directory, or for the whole codebase."""
+        rows = self.query_history(directory)
+        label = f"{directory}/" if directory else self.root_path.name
+        series = "git revisions" if self.git_rev else "working tree"
+        print(f"📈 History for {label}, {series} ({len(rows):,} runs)")
+        print("-" * 92)
+        print(f"{'Timestamp':<20} {'Revision':<11} {'Files':<8} {'Lines':<10} {'Change':<10} "
+              f"{'Code':<10} {'Comments':<10} {'Blank':<8}")
+        print("-" * 92)
+        previous = None
+        for row in rows:
+            change = '-' if previous is None else f"{row['lines'] - previous:+,}"
+            revision = (row['revision'] or '-')[:11]
+            print(f"{row['timestamp']:<20} {revision:<11} {row['files']:<8,} {row['lines']:<10,} "
+                  f"{change:<10} {row['code_lines']:<10,} {row['comment_lines']:<10,} "
+                  f"{row['blank_lines']:<8,}")
+            previous = row['lines']
+        if not rows:
+            print("   No runs recorded yet.")
+
+    def file_record(self, root_dir_name, file_path, line_counts):
+        """Return the machine-readable record for one counted file."""
+        return {
+            'type': 'file',
+            'path': self.cache_key(file_path),
+            'directory': root_dir_name,
+            'language': language_for_path(file_path),
+            'kind': line_counts.get('kind', 'source'),
+            'lines': line_counts['total'],
+            'code_lines': line_counts['code'],
+            'comment_lines': line_counts['comments'],
+            'blank_lines': line_counts['blank'],
+        }
+
+    def summary_record(self):
+        """Return the machine-readable aggregate of the whole run."""
+        directories = {
+            dir_name: stats.to_dict() for dir_name, stats in sorted(self.stats.items())
+        }
+        totals = {metric: sum(stats[metric] for stats in self.stats.values())
+                  for metric in ('files', 'lines', 'code_lines', 'comment_lines', 'blank_lines')}
+        return {
+            'type': 'summary',
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'path': str(self.root_path),
+            'revision': self.git_commit,
+            'totals': totals,
+            'directories': directories,
+            'sniffed': {kind: len(paths) for kind, paths in sorted(self.sniffed_files.items())},
+            'cache': {'hits': self.cache_hits, 'misses': self.cache_misses},
+            'walk': dict(self.walk_stats),
+            'since': self.since_rev,
+            'profile': self.profile_report() if self.profile is not None else None,
+            'estimate': self.estimate,
+            'delta': {dir_name: {metric: stats[metric] for metric in HISTORY_METRICS}
+                      for dir_name, stats in sorted(self.delta_stats.items())},
+            'breakdowns': {
+                spec: [{'key': list(key) if isinstance(key, tuple) else key, **stats.to_dict()}
+                       for key, stats in self.breakdown_rows(dimensions)]
+                for spec, dimensions in self.breakdowns
+            },
+        }
+
+    def delta_rows(self):
+        """Return (dir_name, stats) for directories that changed in --since mode, biggest first."""
+        changed = [(dir_name, stats) for dir_name, stats in self.delta_stats.items()
+                   if any(stats[metric] for metric in HISTORY_METRICS)]
+        return sorted(changed, key=lambda x: abs(x[1]['lines']), reverse=True)
 
     def generate_markdown_report(self):
         """Generate a markdown report."""
@@ -198,6 +2304,33 @@ class CodebaseAnalyzer:
             if stats['files'] > 0:
                 markdown_content += f"| **{dir_name}** | {stats['files']:,} | {stats['lines']:,} | {stats['code_lines']:,} | {stats['comment_lines']:,} | {stats['blank_lines']:,} |\n"
         
+        if self.since_rev:
+            markdown_content += f"""
+---
+
+## 📐 Changes Since `{self.since_rev}`
+
+| Directory | Files | Lines | Code | Comments | Blank |
+|-----------|-------|-------|------|----------|-------|
+"""
+            for dir_name, stats in self.delta_rows():
+                markdown_content += f"| **{dir_name}** | {stats['files']:+,} | {stats['lines']:+,} | {stats['code_lines']:+,} | {stats['comment_lines']:+,} | {stats['blank_lines']:+,} |\n"
+        
+        if self.estimate is not None:
+            estimate = self.estimate
+            markdown_content += f"""
+---
+
+## 🎲 Estimate
+
+Totals above are estimated from {estimate['files_sampled']:,} of {estimate['files_enumerated']:,} files (sampling rate {estimate['rate']:g}, stratified by directory and extension).
+
+| Metric | Estimate | {estimate['confidence']:.0%} Interval |
+|--------|----------|--------------|
+"""
+            for metric, total in estimate['totals'].items():
+                markdown_content += f"| {metric} | {total['value']:,} | {total['low']:,} – {total['high']:,} |\n"
+        
         markdown_content += f"""
 ---
 
@@ -211,6 +2344,21 @@ class CodebaseAnalyzer:
             if ext:
                 markdown_content += f"| **{ext}** | {count:,} |\n"
         
+        if self.sniffed_files:
+            markdown_content += f"""
+---
+
+## 🚫 Skipped and Line-Counted Files
+
+| Kind | Files | Reason | Examples |
+|------|-------|--------|----------|
+"""
+            for kind, paths in sorted(self.sniffed_files.items()):
+                examples = ', '.join(f"`{path}`" for path in paths[:3])
+                if len(paths) > 3:
+                    examples += ', ...'
+                markdown_content += f"| **{kind}** | {len(paths):,} | {SNIFF_REASONS[kind]} | {examples} |\n"
+        
         markdown_content += f"""
 ---
 
@@ -314,6 +2462,8 @@ This changelog tracks all codebase analysis runs over time, showing how the proj
         print(f"   💻 Code Lines: {total_code:,}")
         print(f"   💬 Comment Lines: {total_comments:,}")
         print(f"   ⚪ Blank Lines: {total_blank:,}")
+        if self.estimate is not None:
+            self.print_estimate()
         
         if total_lines > 0:
             code_percentage = (total_code / total_lines) * 100
@@ -335,6 +2485,16 @@ This changelog tracks all codebase analysis runs over time, showing how the proj
                       f"{stats['code_lines']:<10,} {stats['comment_lines']:<10,} "
                       f"{stats['blank_lines']:<8,}")
         
+        if self.since_rev:
+            print(f"\n📐 CHANGES SINCE {self.since_rev}:")
+            print("-" * 80)
+            print(f"{'Directory':<20} {'Files':<8} {'Lines':<10} {'Code':<10} {'Comments':<10} {'Blank':<8}")
+            print("-" * 80)
+            for dir_name, stats in self.delta_rows():
+                print(f"{dir_name:<20} {stats['files']:<+8,} {stats['lines']:<+10,} "
+                      f"{stats['code_lines']:<+10,} {stats['comment_lines']:<+10,} "
+                      f"{stats['blank_lines']:<+8,}")
+        
         print("\n📋 TOP FILE TYPES:")
         print("-" * 40)
         all_file_types = defaultdict(int)
@@ -347,22 +2507,297 @@ This changelog tracks all codebase analysis runs over time, showing how the proj
             if ext:
                 print(f"   {ext:<8} {count:>6,} files")
         
+        for spec, dimensions in self.breakdowns:
+            print(f"\n🧮 BREAKDOWN BY {spec}:")
+            print("-" * 80)
+            print(f"{'Group':<40} {'Files':<8} {'Lines':<10} {'Code':<10} {'Comments':<10}")
+            print("-" * 80)
+            for key, stats in self.breakdown_rows(dimensions):
+                label = ' · '.join(key) if isinstance(key, tuple) else key
+                print(f"{label:<40} {stats['files']:<8,} {stats['lines']:<10,} "
+                      f"{stats['code_lines']:<10,} {stats['comment_lines']:<10,}")
+        
+        if self.sniffed_files:
+            print("\n🚫 SKIPPED AND LINE-COUNTED FILES:")
+            print("-" * 40)
+            for kind, paths in sorted(self.sniffed_files.items()):
+                print(f"   {kind:<10} {len(paths):>6,} files ({SNIFF_REASONS[kind]})")
+        
         print("\n" + "=" * 80)
         
         # Generate and save markdown report
         print("\n📝 Updating changelog...")
-        markdown_content = self.generate_markdown_report()
-        self.save_report(markdown_content)
+        with self.phase('report'):
+            markdown_content = self.generate_markdown_report()
+            self.save_report(markdown_content)
+
+class BatchAnalyzer:
+    """Analyze several codebases in one process, for one combined report.
+
+    Roots are analyzed in turn, all on one worker pool, and share one
+    content cache: the --git blob cache file under cache_dir (default:
+    reports/.analyzer-cache in the current directory). A file vendored
+    or copied into several roots is therefore counted once.
+    """
+
+    def __init__(self, roots, jobs=None, use_cache=True, cache_dir=None):
+        self.analyzers = [CodebaseAnalyzer(root, jobs=jobs, use_cache=use_cache) for root in roots]
+        self.jobs = self.analyzers[0].jobs
+        cache_dir = Path(cache_dir or Path('reports') / '.analyzer-cache').resolve()
+        for analyzer in self.analyzers:
+            analyzer.blob_cache_file = cache_dir / 'blob_counts.json'
+        
+        # Report roots by directory name, falling back to the full path when names clash
+        names = [analyzer.root_path.name for analyzer in self.analyzers]
+        self.names = [name if names.count(name) == 1 else str(analyzer.root_path)
+                      for name, analyzer in zip(names, self.analyzers)]
+        self.on_file = None
+        self.known_contents = 0
+
+    def analyze(self):
+        """Analyze every root, sharing the worker pool and the content cache."""
+        from concurrent.futures import ProcessPoolExecutor
+        blobs = self.analyzers[0].load_blob_cache()
+        pool = ProcessPoolExecutor(max_workers=self.jobs) if self.jobs > 1 else nullcontext()
+        with pool as executor:
+            for name, analyzer in zip(self.names, self.analyzers):
+                analyzer.content_cache = blobs
+                analyzer.executor = executor
+                if self.on_file is not None:
+                    analyzer.on_file = lambda record, name=name: self.on_file({**record, 'root': name})
+                analyzer.analyze_codebase()
+                analyzer.executor = None
+                print()
+        self.known_contents = len(blobs)
+        self.analyzers[0].save_blob_cache(blobs)
+
+    def root_totals(self):
+        """Return [(root name, DirectoryStats)] with each root's overall totals."""
+        return [(name, reduce(DirectoryStats.merge, analyzer.stats.values(), DirectoryStats()))
+                for name, analyzer in zip(self.names, self.analyzers)]
+
+    def summary_record(self):
+        """Return the machine-readable aggregate of the whole batch."""
+        roots = self.root_totals()
+        totals = reduce(DirectoryStats.merge, (stats for _, stats in roots), DirectoryStats())
+        return {
+            'type': 'batch_summary',
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'totals': totals.to_dict(),
+            'roots': {name: analyzer.summary_record()
+                      for name, analyzer in zip(self.names, self.analyzers)},
+            'content': {'files_reused': sum(analyzer.content_hits for analyzer in self.analyzers),
+                        'known_contents': self.known_contents},
+        }
+
+    def print_results(self):
+        """Print the combined report."""
+        roots = self.root_totals()
+        totals = reduce(DirectoryStats.merge, (stats for _, stats in roots), DirectoryStats())
+        print("=" * 80)
+        print(f"📦 BATCH ANALYSIS RESULTS ({len(roots)} codebases)")
+        print("=" * 80)
+        
+        print(f"\n🎯 OVERALL TOTALS:")
+        print(f"   📄 Total Files: {totals.files:,}")
+        print(f"   📏 Total Lines: {totals.lines:,}")
+        print(f"   💻 Code Lines: {totals.code_lines:,}")
+        print(f"   💬 Comment Lines: {totals.comment_lines:,}")
+        print(f"   ⚪ Blank Lines: {totals.blank_lines:,}")
+        
+        print(f"\n📁 BREAKDOWN BY CODEBASE:")
+        print("-" * 80)
+        print(f"{'Codebase':<30} {'Files':<8} {'Lines':<10} {'Code':<10} {'Comments':<10} {'Blank':<8}")
+        print("-" * 80)
+        for name, stats in sorted(roots, key=lambda x: x[1].lines, reverse=True):
+            print(f"{name:<30} {stats.files:<8,} {stats.lines:<10,} {stats.code_lines:<10,} "
+                  f"{stats.comment_lines:<10,} {stats.blank_lines:<8,}")
+        
+        print("\n📋 TOP FILE TYPES:")
+        print("-" * 40)
+        sorted_types = sorted(totals.file_types.items(), key=lambda x: x[1], reverse=True)
+        for ext, count in sorted_types[:10]:
+            if ext:
+                print(f"   {ext:<8} {count:>6,} files")
+        
+        reused = sum(analyzer.content_hits for analyzer in self.analyzers)
+        print(f"\n🧬 {reused:,} files matched content already counted; "
+              f"{self.known_contents:,} distinct contents known")
+        print("\n" + "=" * 80)
+
+
+class RecordStream:
+    """Write analyzer records to a text stream as soon as they are produced.
+
+    'ndjson' writes one JSON object per line, ending with the summary.
+    'json' writes a single {"<key>": [...], "summary": {...}} document,
+    emitted incrementally so it can still be consumed as a stream.
+    """
+
+    def __init__(self, out, output_format, key='files'):
+        self.out = out
+        self.output_format = output_format
+        self.opening = json.dumps(key) + ': ['
+        self.first = True
+
+    def write(self, record):
+        """Emit one record."""
+        if self.output_format == 'ndjson':
+            self.out.write(json.dumps(record) + '\n')
+        else:
+            self.out.write(('{' + self.opening + '\n' if self.first else ',\n') + json.dumps(record))
+            self.first = False
+        self.out.flush()
+
+    def close(self, summary):
+        """Emit the final aggregate record."""
+        if self.output_format == 'ndjson':
+            self.out.write(json.dumps(summary) + '\n')
+        else:
+            self.out.write(('{' + self.opening if self.first else '\n') + '],\n"summary": '
+                           + json.dumps(summary) + '}\n')
+        self.out.flush()
 
 def main():
     parser = argparse.ArgumentParser(description='Analyze codebase line counts')
-    parser.add_argument('path', nargs='?', default='.', 
-                       help='Path to codebase root (default: current directory)')
+    parser.add_argument('path', nargs='*', default=['.'],
+                       help='Path to codebase root (default: current directory); several roots '
+                            'are analyzed together, sharing a content cache, for one combined report')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                       help='Worker processes for line counting (default: CPU count, 1 = serial)')
+    parser.add_argument('--io-threads', type=int, default=0, metavar='N',
+                       help='Read files ahead on N threads, feeding the counters through a bounded '
+                            'queue; helps on high-latency storage such as NFS (default: 0, off)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Ignore and do not update reports/.analyzer-cache')
+    parser.add_argument('--git', nargs='?', const='HEAD', default=None, metavar='REV',
+                       help='Count the files of a git revision (default: HEAD) by blob, '
+                            'honoring .gitignore and reusing counts for blobs seen before')
+    parser.add_argument('--format', choices=['markdown', 'json', 'ndjson'], default='markdown',
+                       help='Output format: markdown prints results and appends to the changelog; '
+                            'json and ndjson stream per-file records and a summary to stdout, '
+                            'with progress on stderr (default: markdown)')
+    parser.add_argument('--since', metavar='REV',
+                       help='Report the --git revision (default: HEAD) as a cached baseline for REV '
+                            'plus per-directory deltas, recounting only files changed between them')
+    parser.add_argument('--watch', action='store_true',
+                       help='After the first scan, keep recounting files as they change '
+                            '(inotify on Linux, polling elsewhere) until Ctrl+C')
+    parser.add_argument('--poll', action='store_true',
+                       help='With --watch, poll the tree instead of using inotify')
+    parser.add_argument('--profile', nargs='?', type=int, const=10, default=None, metavar='N',
+                       help='Report per-phase wall/CPU time, bytes read, per-extension cost '
+                            'and the N slowest files (default N: 10)')
+    parser.add_argument('--profile-output', metavar='FILE',
+                       help='With --profile, also write cProfile stats of this process to FILE '
+                            '(use -j 1 to include counting)')
+    parser.add_argument('--group-by', action='append', default=[], metavar='SPEC',
+                       help="Add a breakdown from the same scan; repeatable. SPEC is 'dir[:DEPTH]', "
+                            "'ext', 'owner[:CODEOWNERS]' or 'glob:LABEL=PATTERN,...', "
+                            "crossed with '+' (e.g. dir:2+ext)")
+    parser.add_argument('--estimate', nargs='?', type=float, const=ESTIMATE_RATE, default=None,
+                       metavar='RATE',
+                       help='Estimate totals by reading only a stratified random sample of RATE of '
+                            f'the files (default: {ESTIMATE_RATE:g}), with 95%% confidence intervals')
+    parser.add_argument('--history', nargs='?', const='', default=None, metavar='DIR',
+                       help='Show recorded totals over time for a root directory '
+                            '(or the whole codebase) instead of analyzing; with --git or '
+                            '--since, shows the runs recorded for git revisions')
     args = parser.parse_args()
+    if args.watch and (args.git or args.since):
+        parser.error('--watch counts the working tree and cannot be combined with --git or --since')
+    if args.profile_output and args.profile is None:
+        parser.error('--profile-output needs --profile')
+    if args.io_threads and (args.git or args.since):
+        parser.error('--io-threads reads working-tree files and cannot be combined with --git or '
+                     '--since, which read blobs through git')
+    if args.estimate is not None:
+        if not 0 < args.estimate <= 1:
+            parser.error('--estimate RATE must be greater than 0 and at most 1')
+        if args.git or args.since or args.watch or args.group_by or len(args.path) > 1:
+            parser.error('--estimate samples the working tree and cannot be combined with --git, '
+                         '--since, --watch, --group-by or several paths')
+    if args.group_by and args.since:
+        parser.error('--group-by needs every file\'s counts and cannot be combined with --since')
+    
+    if len(args.path) > 1:
+        if (args.git or args.since or args.watch or args.history is not None or args.group_by
+                or args.profile is not None or args.io_threads):
+            parser.error('several paths (batch mode) cannot be combined with --git, --since, '
+                         '--watch, --history, --group-by, --profile or --io-threads')
+        batch = BatchAnalyzer(args.path, jobs=args.jobs, use_cache=not args.no_cache)
+        if args.format == 'markdown':
+            batch.analyze()
+            batch.print_results()
+            return
+        records = RecordStream(sys.stdout, args.format)
+        batch.on_file = records.write
+        with redirect_stdout(sys.stderr):
+            batch.analyze()
+        records.close(batch.summary_record())
+        return
+    
+    git_rev = args.git or ('HEAD' if args.since else None)
+    analyzer = CodebaseAnalyzer(args.path[0], jobs=args.jobs, use_cache=not args.no_cache,
+                                git_rev=git_rev, since_rev=args.since, io_threads=args.io_threads,
+                                estimate_rate=args.estimate)
+    for spec in args.group_by:
+        try:
+            analyzer.add_breakdown(spec)
+        except (ValueError, OSError) as e:
+            parser.error(f"--group-by {spec}: {e}")
+    if args.history is not None:
+        directory = args.history.strip('/') or None
+        if args.format == 'markdown':
+            analyzer.print_history(directory)
+        else:
+            rows = analyzer.query_history(directory)
+            records = RecordStream(sys.stdout, args.format, key='runs')
+            for row in rows:
+                records.write({'type': 'run', 'directory': directory, **row})
+            records.close({'type': 'summary', 'directory': directory, 'runs': len(rows)})
+        return
+    
+    def analyze():
+        if not args.watch:
+            analyzer.analyze_codebase()
+            return
+        try:
+            analyzer.watch(poll=args.poll)
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")
+    
+    profiler = None
+    if args.profile is not None:
+        analyzer.start_profile(args.profile)
+        if args.profile_output:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+    
+    def finish_profile():
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile_output)
+            print(f"💾 cProfile stats written to {args.profile_output}")
+        if analyzer.profile is not None:
+            analyzer.print_profile()
+    
+    if args.format == 'markdown':
+        analyze()
+        analyzer.save_history()
+        analyzer.print_results()
+        finish_profile()
+        return
     
-    analyzer = CodebaseAnalyzer(args.path)
-    analyzer.analyze_codebase()
-    analyzer.print_results()
+    # Keep stdout for records only; progress messages go to stderr
+    records = RecordStream(sys.stdout, args.format)
+    analyzer.on_file = records.write
+    with redirect_stdout(sys.stderr):
+        analyze()
+        analyzer.save_history()
+        finish_profile()
+    records.close(analyzer.summary_record())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Codebase Analyzer Benchmarks
+Measures the performance characteristics of codebase_analyzer.py.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import codebase_analyzer  # noqa: E402
+
+# A few kilobytes of lockfile-like JSON, repeated to build large inputs
+SAMPLE_BLOCK = "".join(
+    f'    "node_modules/package-{i}": {{\n'
+    f'      "version": "1.{i}.0",\n'
+    f'      "resolved": "https://registry.npmjs.org/package-{i}/-/package-{i}-1.{i}.0.tgz",\n'
+    f'      "integrity": "sha512-{"x" * 64}"\n'
+    f'    }},\n'
+    for i in range(40)
+)
+
+
+# A small TypeScript module with line, JSDoc and inline block comments
+SOURCE_BLOCK = """import { useState } from 'react';
+// Shared helpers for the mentor dashboard
+
+/**
+ * Format a session date for display.
+ * @param date - the session start time
+ */
+export function formatSessionDate(date: Date): string {
+  const options = { weekday: 'long', month: 'short' }; /* locale aware */
+
+  return date.toLocaleDateString('en-GB', options);
+}
+
+const banner = `
+  // inside a template literal, so this is code
+`;
+export const useMentorState = () => {
+  const [mentors, setMentors] = useState([]);
+  /* TODO: paginate */
+  return { mentors, setMentors };
+};
+
+"""
+
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MB, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def write_sample_file(path, size_mb):
+    """Write a file of roughly size_mb megabytes of lockfile-like JSON."""
+    block = SAMPLE_BLOCK.encode('utf-8')
+    repeats = max(1, (size_mb * 1024 * 1024) // len(block))
+    with open(path, 'wb') as f:
+        f.write(b'{\n')
+        for _ in range(repeats):
+            f.write(block)
+        f.write(b'}\n')
+
+
+def count_with_readlines(file_path):
+    """The pre-streaming implementation: materialize every line at once."""
+    syntax = codebase_analyzer.COMMENT_SYNTAX[codebase_analyzer.language_for_path(file_path)]
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return codebase_analyzer.classify_lines(f.readlines(), syntax)
+
+
+def count_with_stream(file_path):
+    """The streaming classifier over the whole file, whatever its size."""
+    language = codebase_analyzer.language_for_path(file_path)
+    with open(file_path, 'rb') as f:
+        return codebase_analyzer.count_stream_lines(f.read, language)
+
+
+# count_file_lines() only counts newlines in files over MAX_CLASSIFIED_SIZE,
+# so the streaming classifier is measured on its own as well
+COUNTERS = {
+    'readlines': count_with_readlines,
+    'streaming': count_with_stream,
+    'analyzer': codebase_analyzer.count_file_lines,
+}
+
+
+def measure_counter(counter_name, file_path):
+    """Count one file and print timing and peak RSS as JSON (run in a fresh process)."""
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    counts = COUNTERS[counter_name](file_path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'seconds': elapsed,
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': peak_rss_mb(),
+        'lines': counts['total'],
+    }))
+
+
+def run_memory_benchmark(sizes_mb):
+    """Compare peak RSS of readlines() and streaming counting across file sizes."""
+    print("🧪 Peak RSS by file size (each measurement runs in a fresh process)")
+    print("-" * 72)
+    print(f"{'Size':<10} {'Counter':<12} {'Lines':>12} {'Seconds':>10} {'Peak RSS':>12} {'Growth':>10}")
+    print("-" * 72)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in sizes_mb:
+            sample = Path(tmp_dir) / f"sample-{size_mb}mb.json"
+            write_sample_file(sample, size_mb)
+            for counter_name in COUNTERS:
+                output = subprocess.run(
+                    [sys.executable, __file__, '_measure', counter_name, str(sample)],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(output)
+                if result['peak_rss_mb'] is None:
+                    peak = growth = 'n/a'
+                else:
+                    peak = f"{result['peak_rss_mb']:.1f} MB"
+                    growth = f"{result['peak_rss_mb'] - result['baseline_rss_mb']:.1f} MB"
+                print(f"{size_mb:<7} MB {counter_name:<12} {result['lines']:>12,} "
+                      f"{result['seconds']:>10.2f} {peak:>12} {growth:>10}")
+            sample.unlink()
+
+    print("-" * 72)
+    print("Streaming growth should stay flat as the file size increases. The analyzer row")
+    print(f"only counts newlines above {codebase_analyzer.MAX_CLASSIFIED_SIZE >> 20} MB.")
+
+
+def classify_per_line(data, language):
+    """The per-line reference classifier over readlines(), independent of the streaming reader."""
+    text = data.decode('utf-8', errors='ignore')
+    return codebase_analyzer.classify_lines(io.StringIO(text, newline=None).readlines(),
+                                            codebase_analyzer.COMMENT_SYNTAX[language])
+
+
+def classify_fast_path(data, language):
+    """The block-level fast path used by count_file_lines()."""
+    return codebase_analyzer.count_stream_lines(io.BytesIO(data).read, language)
+
+
+# Lines over 100K characters, so repeats of them straddle read boundaries:
+# a block comment closed early on a line of code, and a string closed
+# on the line it opens
+LONG_LINE_BLOCKS = {
+    'long JS lines': ('/* ' + 'c' * 10_000 + ' */ code' + 'x' * 100_000 + '\nlet a = 1;\n// note\n',
+                      'javascript'),
+    'long Python': ('x = """' + 'a' * 100_000 + '"""' + 'b' * 5 + '\ny = 2\n', 'python'),
+}
+
+# Sample name -> (text, language)
+CLASSIFY_SAMPLES = {
+    'lockfile JSON': (SAMPLE_BLOCK, 'text'),
+    'TypeScript': (SOURCE_BLOCK, 'javascript'),
+    **LONG_LINE_BLOCKS,
+}
+
+
+def run_classify_benchmark(size_mb, repeats):
+    """Compare the per-line classifier with the block-level fast path."""
+    print(f"🧪 Classifying {size_mb} MB of each sample, best of {repeats}")
+    print("-" * 60)
+    print(f"{'Sample':<16} {'Classifier':<12} {'Seconds':>9} {'MB/sec':>9} {'Speedup':>9}")
+    print("-" * 60)
+
+    mismatches = []
+    for sample_name, (sample, language) in CLASSIFY_SAMPLES.items():
+        block = sample.encode('utf-8')
+        data = block * max(1, (size_mb * 1024 * 1024) // len(block))
+        megabytes = len(data) / (1024 * 1024)
+
+        results = {}
+        timings = {}
+        for name, classify in (('per-line', classify_per_line), ('fast path', classify_fast_path)):
+            best = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                results[name] = classify(data, language)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            speedup = timings['per-line'] / best
+            print(f"{sample_name:<16} {name:<12} {best:>9.3f} {megabytes / best:>9.1f} {speedup:>8.1f}x")
+
+        if results['per-line'] != results['fast path']:
+            mismatches.append((sample_name, results['per-line'], results['fast path']))
+
+    print("-" * 60)
+    if mismatches:
+        for sample_name, expected, actual in mismatches:
+            print(f"❌ {sample_name}: results differ: {expected} != {actual}")
+        sys.exit(1)
+    print("✅ Identical results for every sample")
+
+
+# Synthetic tree content: a few representative lines per language, mixed at random
+SYNTHETIC_LINES = {
+    'ts': ["import { useState } from 'react';", "// TODO: tidy up", "/**", " * Helper docs", " */",
+           "export const value = compute(input, options);", "  return { mentors, setMentors };", ""],
+    'py': ["import os", "# comment", '"""Docstring."""', "def handler(event):",
+           "    return event.get('body')", ""],
+    'css': [".card { display: flex; }", "/* layout */", "  margin: 0 auto;", ""],
+    'md': ["# Heading", "Some prose describing the feature.", "- bullet point", ""],
+    'json': ['  "name": "bgr8",', '  "version": "1.0.0",', '  "private": true,', ""],
+}
+DEFAULT_MIX = 'ts:50,py:20,css:10,md:10,json:10'
+SUITE_PHASES = ('walk', 'count', 'aggregate', 'render')
+DEFAULT_BASELINE = REPO_ROOT / "reports" / ".analyzer-cache" / "benchmark-baseline.json"
+
+
+def parse_mix(mix):
+    """Parse 'ts:50,py:20' into ([extensions], [weights])."""
+    extensions, weights = [], []
+    for part in mix.split(','):
+        ext, _, weight = part.partition(':')
+        if ext not in SYNTHETIC_LINES:
+            raise ValueError(f"unknown language '{ext}' (choose from {', '.join(SYNTHETIC_LINES)})")
+        extensions.append(ext)
+        weights.append(float(weight or 1))
+    return extensions, weights
+
+
+def generate_tree(root, files, depth, size_kb, mix=DEFAULT_MIX, huge_mb=0, seed=0):
+    """Write a reproducible synthetic codebase under root and return its size in bytes.
+
+    Files are spread over root directories nested up to depth levels, with
+    sizes around size_kb. With huge_mb, two pathological files are added:
+    one minified single-line bundle and one ordinary file of that size.
+    """
+    rng = random.Random(seed)
+    extensions, weights = parse_mix(mix)
+    root = Path(root)
+    total_bytes = 0
+    for index in range(files):
+        ext = rng.choices(extensions, weights)[0]
+        parts = [f"pkg{rng.randrange(8)}"] + [f"d{rng.randrange(4)}" for _ in range(rng.randrange(depth))]
+        path = root.joinpath(*parts, f"file{index}.{ext}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        target = max(1, int(rng.uniform(0.5, 1.5) * size_kb * 1024))
+        lines = SYNTHETIC_LINES[ext]
+        content = []
+        written = 0
+        while written < target:
+            line = rng.choice(lines)
+            content.append(line)
+            written += len(line) + 1
+        data = ('\n'.join(content) + '\n').encode('utf-8')
+        path.write_bytes(data)
+        total_bytes += len(data)
+    
+    if huge_mb:
+        huge_dir = root / "huge"
+        huge_dir.mkdir(parents=True, exist_ok=True)
+        with open(huge_dir / "bundle.min.js", 'wb') as f:
+            for _ in range(huge_mb * 1024):
+                f.write(b'var a=function(b){return b*2};' * 33)
+        block = ('\n'.join(SYNTHETIC_LINES['ts']) + '\n').encode('utf-8')
+        with open(huge_dir / "generated-types.ts", 'wb') as f:
+            f.write(block * (huge_mb * 1024 * 1024 // len(block)))
+        total_bytes += sum(p.stat().st_size for p in huge_dir.iterdir())
+    return total_bytes
+
+
+def run_suite_phases(tree, jobs, repeats):
+    """Time each analyzer phase on tree (run in a fresh process) and print the results as JSON."""
+    timings = {phase: None for phase in SUITE_PHASES}
+    for _ in range(repeats):
+        analyzer = codebase_analyzer.CodebaseAnalyzer(tree, jobs=jobs, use_cache=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            files = analyzer.discover_files()
+            walked = time.perf_counter()
+            analyzer.count_files(files)
+            counted = time.perf_counter()
+            analyzer.summary_record()
+            aggregated = time.perf_counter()
+            analyzer.generate_markdown_report()
+            rendered = time.perf_counter()
+        elapsed = {'walk': walked - start, 'count': counted - walked,
+                   'aggregate': aggregated - counted, 'render': rendered - aggregated}
+        for phase, seconds in elapsed.items():
+            if timings[phase] is None or seconds < timings[phase]:
+                timings[phase] = seconds
+    
+    print(json.dumps({
+        'phases': timings,
+        'files': len(files),
+        'bytes': sum(file_path.stat().st_size for _, file_path in files),
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+
+def run_suite(args):
+    """Generate (or reuse) a tree, time every phase and compare against the stored baseline."""
+    config = {'files': args.files, 'depth': args.depth, 'size_kb': args.size_kb, 'mix': args.mix,
+              'huge_mb': args.huge_mb, 'jobs': args.jobs, 'tree': args.tree}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tree = args.tree
+        if tree is None:
+            tree = tmp_dir
+            print(f"🏗️  Generating {args.files:,} files (depth {args.depth}, ~{args.size_kb} KB, "
+                  f"mix {args.mix}{f', huge {args.huge_mb} MB' if args.huge_mb else ''})...")
+            generate_tree(tree, args.files, args.depth, args.size_kb, args.mix, args.huge_mb)
+        output = subprocess.run(
+            [sys.executable, __file__, '_suite', str(tree), '--jobs', str(args.jobs),
+             '--repeats', str(args.repeats)],
+            capture_output=True, text=True, check=True
+        ).stdout
+    result = json.loads(output)
+    
+    baseline = None
+    if args.baseline.exists():
+        stored = json.loads(args.baseline.read_text(encoding='utf-8'))
+        if stored.get('config') == config:
+            baseline = stored
+        else:
+            print(f"⚠️  Baseline {args.baseline} was recorded with a different configuration; not comparing")
+    
+    megabytes = result['bytes'] / (1024 * 1024)
+    print(f"🧪 {result['files']:,} files, {megabytes:.1f} MB, jobs={args.jobs}, best of {args.repeats}")
+    print("-" * 72)
+    print(f"{'Phase':<12} {'Seconds':>10} {'Files/sec':>12} {'MB/sec':>10} {'Baseline':>10} {'Change':>10}")
+    print("-" * 72)
+    regressions = []
+    for phase in SUITE_PHASES:
+        seconds = result['phases'][phase]
+        files_per_sec = result['files'] / seconds if seconds else float('inf')
+        mb_per_sec = megabytes / seconds if seconds else float('inf')
+        reference = change = '-'
+        if baseline is not None:
+            previous = baseline['phases'][phase]
+            reference = f"{previous:.3f}"
+            ratio = seconds / previous if previous else 1.0
+            change = f"{(ratio - 1) * 100:+.0f}%"
+            # Ignore noise on phases too short to measure reliably
+            if ratio > 1 + args.threshold / 100 and seconds - previous > 0.01:
+                regressions.append(phase)
+                change += " ❌"
+        print(f"{phase:<12} {seconds:>10.3f} {files_per_sec:>12,.0f} {mb_per_sec:>10.1f} "
+              f"{reference:>10} {change:>10}")
+    print("-" * 72)
+    if result['peak_rss_mb'] is not None:
+        print(f"Peak RSS: {result['peak_rss_mb']:.1f} MB")
+    
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({'config': config, **result}, indent=2), encoding='utf-8')
+        print(f"💾 Baseline saved to {args.baseline}")
+    if regressions:
+        print(f"❌ Slower than baseline by more than {args.threshold:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+    if baseline is not None:
+        print("✅ No regressions against the baseline")
+
+
+def time_command(command, repeats):
+    """Return the median wall time of a command in milliseconds, after one warm-up run."""
+    timings = []
+    for _ in range(repeats + 1):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings[1:])[repeats // 2]
+
+
+def run_startup_benchmark(repeats, target_ms, jobs):
+    """Time `--help` and a tiny-tree run in fresh interpreters against a latency target.
+
+    Measures both `python codebase_analyzer.py` (the script is recompiled
+    on every run) and `python -m codebase_analyzer` (cached bytecode).
+    Exits with status 1 if an analyzer command misses the target.
+    """
+    script = str(REPO_ROOT / "codebase_analyzer.py")
+    with tempfile.TemporaryDirectory() as tiny_tree:
+        generate_tree(tiny_tree, files=20, depth=2, size_kb=2)
+        commands = [
+            ('python -c pass', [sys.executable, '-c', 'pass']),
+            ('--help (script)', [sys.executable, script, '--help']),
+            ('--help (-m)', [sys.executable, '-m', 'codebase_analyzer', '--help']),
+            ('tiny tree (script)', [sys.executable, script, tiny_tree, '-j', str(jobs)]),
+            ('tiny tree (-m)', [sys.executable, '-m', 'codebase_analyzer', tiny_tree, '-j', str(jobs)]),
+        ]
+        if os.environ.get('PYTHONDONTWRITEBYTECODE'):
+            print("⚠️  PYTHONDONTWRITEBYTECODE is set, so -m runs cannot use cached bytecode")
+        print(f"🚀 Startup latency, median of {repeats} runs (target {target_ms:g} ms)")
+        print("-" * 50)
+        slow = []
+        for label, command in commands:
+            elapsed = time_command(command, repeats)
+            mark = ''
+            if command[1] != '-c' and elapsed > target_ms:
+                slow.append(label)
+                mark = ' ❌'
+            print(f"{label:<24} {elapsed:>10.1f} ms{mark}")
+        print("-" * 50)
+    if slow:
+        print(f"❌ Over the {target_ms:g} ms target: {', '.join(slow)}")
+        sys.exit(1)
+    print("✅ All commands within target")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark codebase_analyzer.py')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    memory = subparsers.add_parser('memory', help='Peak RSS of line counting versus file size')
+    memory.add_argument('--sizes', type=int, nargs='+', default=[8, 32, 128],
+                        help='File sizes to test, in MB (default: 8 32 128)')
+
+    classify = subparsers.add_parser('classify', help='Per-line classifier versus the block fast path')
+    classify.add_argument('--size', type=int, default=32, help='Input size in MB (default: 32)')
+    classify.add_argument('--repeats', type=int, default=3, help='Runs per classifier (default: 3)')
+
+    startup = subparsers.add_parser('startup', help='Startup latency of --help and a tiny-tree run')
+    startup.add_argument('--repeats', type=int, default=10, help='Runs per command (default: 10)')
+    startup.add_argument('--target-ms', type=float, default=150,
+                         help='Latency each analyzer command must stay under (default: 150)')
+    startup.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                         help='Jobs for the tiny-tree run (default: CPU count, like the analyzer)')
+
+    generate = subparsers.add_parser('generate', help='Write a synthetic codebase to a directory')
+    suite = subparsers.add_parser('suite', help='Time walk, count, aggregate and render phases '
+                                                'and compare against a stored baseline')
+    for command in (generate, suite):
+        command.add_argument('--files', type=int, default=2000, help='Number of files (default: 2000)')
+        command.add_argument('--depth', type=int, default=4, help='Maximum directory depth (default: 4)')
+        command.add_argument('--size-kb', type=int, default=8, help='Average file size in KB (default: 8)')
+        command.add_argument('--mix', default=DEFAULT_MIX,
+                             help=f'Language mix as ext:weight pairs (default: {DEFAULT_MIX})')
+        command.add_argument('--huge-mb', type=int, default=0,
+                             help='Also add a minified bundle and a plain file of this size in MB')
+    generate.add_argument('path', help='Directory to write the tree into')
+    suite.add_argument('--tree', help='Benchmark an existing tree instead of generating one')
+    suite.add_argument('--jobs', type=int, default=1, help='Worker processes for counting (default: 1)')
+    suite.add_argument('--repeats', type=int, default=3, help='Runs per phase, best kept (default: 3)')
+    suite.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE,
+                       help='Baseline file to compare against (default: reports/.analyzer-cache/'
+                            'benchmark-baseline.json)')
+    suite.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline')
+    suite.add_argument('--threshold', type=float, default=20,
+                       help='Percent slowdown that counts as a regression (default: 20)')
+
+    # Internal: a single measurement, run in a child process for clean RSS numbers
+    measure = subparsers.add_parser('_measure')
+    measure.add_argument('counter', choices=sorted(COUNTERS))
+    measure.add_argument('file')
+    phases = subparsers.add_parser('_suite')
+    phases.add_argument('tree')
+    phases.add_argument('--jobs', type=int, default=1)
+    phases.add_argument('--repeats', type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == 'memory':
+        run_memory_benchmark(args.sizes)
+    elif args.command == 'classify':
+        run_classify_benchmark(args.size, args.repeats)
+    elif args.command == 'startup':
+        run_startup_benchmark(args.repeats, args.target_ms, args.jobs)
+    elif args.command == 'generate':
+        total_bytes = generate_tree(args.path, args.files, args.depth, args.size_kb, args.mix,
+                                    args.huge_mb)
+        print(f"🏗️  Wrote {args.files:,} files ({total_bytes / (1024 * 1024):.1f} MB) to {args.path}")
+    elif args.command == 'suite':
+        run_suite(args)
+    elif args.command == '_measure':
+        measure_counter(args.counter, args.file)
+    elif args.command == '_suite':
+        run_suite_phases(args.tree, args.jobs, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Smart Changelog Benchmarks
+Measures how fast smart-changelog.py turns git history into commit records,
+using a synthetic repository built with git fast-import.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+# smart-changelog.py is a script, not an importable module name
+_spec = importlib.util.spec_from_file_location('smart_changelog', Path(__file__).with_name('smart-changelog.py'))
+smart_changelog = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(smart_changelog)
+
+# Subjects in the styles seen in this repository, including the awkward ones
+SUBJECTS = [
+    "feat: add mentor availability calendar",
+    "fix(auth): handle expired session tokens",
+    "Update booking modal styles",
+    "refactor: split dashboard into smaller components",
+    "docs: describe the release process",
+    "chore(deps): bump firebase to the latest minor",
+    "perf: memoize mentor search results",
+    "Add --format json|ndjson output",
+    "Fix layout when name | role overflow",
+    "remove unused admin analytics page",
+]
+
+BODIES = [
+    "",
+    "",
+    "Explain the change in one line.",
+    "First paragraph of the body.\n\nSecond paragraph with a | pipe|in it|and more|fields.",
+    "- bullet one\n- bullet two\n- bullet three",
+]
+
+LEGACY_FORMAT = "%H|%s|%an|%ad|%b"
+
+
+def generate_history(path, commits, files=200, seed=0):
+    """Create a git repository at path with the given number of synthetic commits."""
+    rng = random.Random(seed)
+    subprocess.run(['git', 'init', '-q', str(path)], check=True)
+
+    paths = [f"src/module{i % 20}/file{i}.ts" for i in range(files)]
+    versions = [0] * files
+    timestamp = 1_600_000_000
+    stream = io.BytesIO()
+
+    def data(text):
+        encoded = text.encode('utf-8')
+        stream.write(b"data %d\n" % len(encoded) + encoded + b"\n")
+
+    for n in range(commits):
+        subject = rng.choice(SUBJECTS)
+        body = rng.choice(BODIES)
+        message = f"{subject} #{n}\n\n{body}\n" if body else f"{subject} #{n}\n"
+        timestamp += rng.randint(60, 3600)
+
+        stream.write(b"commit refs/heads/main\n")
+        stream.write(f"author Dev {n % 7} <dev{n % 7}@example.com> {timestamp} +0000\n".encode())
+        stream.write(f"committer Dev {n % 7} <dev{n % 7}@example.com> {timestamp} +0000\n".encode())
+        data(message)
+        for index in rng.sample(range(files), rng.randint(1, 3)):
+            versions[index] += 1
+            stream.write(f"M 100644 inline {paths[index]}\n".encode())
+            data("".join(f"export const v{line} = {versions[index]};\n"
+                         for line in range(rng.randint(1, 6))))
+        index = rng.randrange(files)
+        if versions[index] and rng.random() < 0.01:
+            # The occasional rename, which numstat reports as extra path records
+            old, paths[index] = paths[index], paths[index].replace('.ts', f'.r{n}.ts')
+            stream.write(f"R {old} {paths[index]}\n".encode())
+        stream.write(b"\n")
+
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=path, input=stream.getvalue(), check=True)
+    subprocess.run(['git', 'checkout', '-q', 'main'], cwd=path, check=True)
+
+
+def parse_legacy(output):
+    """The previous `%H|%s|%an|%ad|%b` line parser, kept here for comparison."""
+    commit_list = []
+    current_commit = None
+    total_insertions = 0
+    total_deletions = 0
+
+    for line in output.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if '|' in line and len(line.split('|')) >= 5:
+            if current_commit is not None:
+                current_commit['insertions'] = total_insertions
+                current_commit['deletions'] = total_deletions
+                commit_list.append(current_commit)
+            parts = line.split('|', 4)
+            current_commit = {'hash': parts[0], 'message': parts[1], 'author': parts[2],
+                              'date': parts[3], 'body': parts[4] if len(parts) > 4 else ''}
+            total_insertions = 0
+            total_deletions = 0
+        else:
+            parts = line.split('\t')
+            if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
+                total_insertions += int(parts[0])
+                total_deletions += int(parts[1])
+
+    if current_commit is not None:
+        current_commit['insertions'] = total_insertions
+        current_commit['deletions'] = total_deletions
+        commit_list.append(current_commit)
+    return commit_list
+
+
+def git_output(repo, pretty, *extra):
+    """Return `git log --numstat` output for the whole history as text."""
+    return subprocess.run(['git', 'log', '--reverse', '--numstat', f'--pretty=format:{pretty}', *extra],
+                          cwd=repo, capture_output=True, check=True,
+                          encoding='utf-8', errors='replace').stdout
+
+
+def best_of(repeats, func):
+    """Run func repeats times and return (best seconds, last result)."""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(args.repo) if args.repo else Path(tmp) / 'history'
+        if not (repo / '.git').exists():
+            print(f"🏗️  Generating {args.commits:,} commits in {repo}...")
+            start = time.perf_counter()
+            generate_history(repo, args.commits, seed=args.seed)
+            print(f"   done in {time.perf_counter() - start:.1f}s")
+
+        legacy_output = git_output(repo, LEGACY_FORMAT)
+        # git computing numstat is the floor for any parser
+        git_time, record_output = best_of(1, lambda: git_output(repo, smart_changelog.LOG_FORMAT, '-z'))
+        print(f"📦 git log output: {len(legacy_output) / 1e6:.1f} MB (legacy), "
+              f"{len(record_output) / 1e6:.1f} MB (-z records)")
+
+        legacy_time, legacy = best_of(args.repeats, lambda: parse_legacy(legacy_output))
+        record_time, records = best_of(args.repeats, lambda: list(
+            smart_changelog.parse_git_log(record_output.split('\0'))))
+
+        # End to end: git, pipe and parser, the way smart-changelog.py runs it
+        cwd = os.getcwd()
+        os.chdir(repo)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                stream_time, streamed = best_of(args.repeats, lambda: list(
+                    smart_changelog.parse_git_log(smart_changelog.stream_git_command(
+                        ['git', 'log', '-z', '--pretty=format:' + smart_changelog.LOG_FORMAT,
+                         '--reverse', '--numstat'], '\0'))))
+
+                # The full commit source, first with an empty commit cache, then warm
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(smart_changelog.COMMIT_CACHE_FILE)
+                cold_time, _ = best_of(1, lambda: list(smart_changelog.iter_commits_since_tag('none')))
+                warm_time, _ = best_of(args.repeats, lambda: list(smart_changelog.iter_commits_since_tag('none')))
+        finally:
+            os.chdir(cwd)
+
+    print(f"\n{'Parser':<28} {'Seconds':>10} {'Commits':>10} {'Commits/s':>12}")
+    print(f"{'git log alone':<28} {git_time:>10.3f}")
+    for name, seconds, commits in (('legacy line parser', legacy_time, legacy),
+                                   ('record parser', record_time, records),
+                                   ('record parser + git pipe', stream_time, streamed)):
+        print(f"{name:<28} {seconds:>10.3f} {len(commits):>10,} {len(commits) / seconds:>12,.0f}")
+    print(f"{'commit cache, cold':<28} {cold_time:>10.3f}")
+    print(f"{'commit cache, warm':<28} {warm_time:>10.3f}")
+
+    expected = {commit['hash']: commit for commit in records}
+    misparsed = sum(1 for commit in legacy
+                    if commit['hash'] not in expected
+                    or commit['message'] != expected[commit['hash']]['message']
+                    or commit['insertions'] != expected[commit['hash']]['insertions'])
+    print(f"\n🔍 Legacy parser: {len(legacy):,} records, {misparsed:,} misparsed or spurious "
+          f"(history has {len(records):,} commits)")
+    print(f"🚀 Record parser speedup: {legacy_time / record_time:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark smart-changelog.py commit parsing')
+    parser.add_argument('--commits', type=int, default=100_000,
+                        help='Commits in the synthetic history (default: 100000)')
+    parser.add_argument('--repo', help='Reuse (or create) the synthetic repository at this path')
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per parser, best kept (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic history')
+    run_benchmark(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -8,8 +8,10 @@ import subprocess
 import re
 import sys
 import os
+import json
+import tempfile
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
 from collections import defaultdict
 
 # Commit type patterns and their emojis
@@ -30,6 +32,51 @@ COMMIT_TYPES = {
     'deps': ('📦 Changed', 'Dependency updates'),
 }
 
+# Keyword rules for commits without a conventional prefix, checked in this
+# order; the first type with a matching keyword wins, otherwise FALLBACK_TYPE.
+# Keywords match whole words (or phrases), allowing -s, -es, -d, -ed, -ing and
+# -ies endings, so "add" matches "Added" but not "address" or "padding".
+CATEGORY_RULES = {
+    'feat': ['add', 'new', 'feature', 'implement', 'create'],
+    'fix': ['fix', 'bug', 'issue', 'error', 'resolve'],
+    'docs': ['doc', 'documentation', 'readme', 'comment', 'changelog'],
+    'style': ['style', 'format', 'formatting', 'indent', 'ui', 'ux'],
+    'refactor': ['refactor', 'restructure', 'clean', 'optimize'],
+    'perf': ['perf', 'performance', 'speed'],
+    'test': ['test', 'spec', 'coverage'],
+    'security': ['security', 'vulnerability', 'auth', 'protect'],
+    'remove': ['remove', 'delete', 'cleanup', 'deprecate', 'drop'],
+    'deps': ['deps', 'dependency', 'package', 'npm', 'yarn'],
+    'chore': ['update', 'change', 'modify', 'improve'],
+}
+FALLBACK_TYPE = 'chore'
+
+# Commits whose subject matches any of these are left out of the changelog
+SKIP_KEYWORDS = ['changelog', 'version', 'release']
+
+# Optional per-repository overrides of CATEGORY_RULES and SKIP_KEYWORDS, e.g.
+# {"categories": {"feat": ["add", "introduce"], ...}, "skip": ["changelog"]}
+RULES_FILE = '.changelog-rules.json'
+
+# git log record layout: with -z every record (the commit header and each
+# numstat entry) is NUL-terminated. A header starts with RS and its fields
+# are US-terminated, so subjects and bodies can hold any printable text.
+RECORD_START = '\x1e'
+FIELD_SEP = '\x1f'
+LOG_FORMAT = '%x1e%H%x1f%s%x1f%an%x1f%ad%x1f%b%x1f'
+
+# Characters read from the git pipe at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Parsed commits are immutable, so they are cached by hash between runs.
+# Each entry is [message, author, date, body, insertions, deletions, type, skip];
+# type and skip are recomputed when the commit rules change.
+COMMIT_CACHE_FILE = os.path.join('reports', '.changelog-cache', 'commits.json')
+COMMIT_CACHE_VERSION = 1
+
+# Where --backfill writes the entries for every release tag
+BACKFILL_OUTPUT = 'smart-changelog-backfill.md'
+
 def run_git_command(command: List[str]) -> str:
     """Run a git command and return the output with proper encoding handling"""
     try:
@@ -62,6 +109,60 @@ def run_git_command(command: List[str]) -> str:
         print(f"Unexpected error running git command: {e}")
         return ""
 
+def stream_git_command(command: List[str], separator: str = '\n',
+                       stdin_lines: Optional[Iterable[str]] = None) -> Iterator[str]:
+    """Run a git command and yield its output one separator-terminated record at a time.
+
+    Unlike run_git_command, the output is never held in memory as a whole,
+    so long histories can be processed one record at a time. stdin_lines,
+    if given, are fed to the command's standard input (e.g. for --stdin).
+    """
+    env = os.environ.copy()
+    env['PYTHONIOENCODING'] = 'utf-8'
+    
+    # stdin and stderr go through temporary files so git can never block on a full pipe
+    with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stderr:
+        if stdin_lines is not None:
+            stdin.write(''.join(line + '\n' for line in stdin_lines).encode('utf-8'))
+            stdin.seek(0)
+        try:
+            process = subprocess.Popen(
+                command,
+                stdin=stdin if stdin_lines is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                text=True,
+                encoding='utf-8',
+                env=env,
+                errors='replace'  # Replace problematic characters instead of failing
+            )
+        except Exception as e:
+            print(f"Unexpected error running git command: {e}")
+            return
+        
+        finished = False
+        try:
+            pending = ''
+            for chunk in iter(lambda: process.stdout.read(STREAM_CHUNK_SIZE), ''):
+                records = (pending + chunk).split(separator)
+                pending = records.pop()
+                yield from records
+            if pending:
+                yield pending
+            finished = True
+        finally:
+            process.stdout.close()
+            if not finished:
+                # The consumer stopped early; don't leave git running
+                process.kill()
+            returncode = process.wait()
+            if finished and returncode != 0:
+                print(f"Warning: Git command returned non-zero exit code: {returncode}")
+                stderr.seek(0)
+                message = stderr.read().decode('utf-8', errors='replace')
+                if message:
+                    print(f"Git stderr: {message}")
+
 def verify_tag_exists(tag: str) -> bool:
     """Verify that a git tag exists"""
     if tag == "none":
@@ -73,8 +174,161 @@ def verify_tag_exists(tag: str) -> bool:
     except:
         return False
 
-def get_commits_since_tag(tag: str) -> List[Dict]:
-    """Get all commits since the specified tag with detailed information including insertions and deletions"""
+def parse_git_log(records: Iterable[str]) -> Iterator[Dict]:
+    """Turn NUL-separated `git log -z --numstat --pretty=format:LOG_FORMAT` records into commits.
+
+    A single pass over the records: a header record starts a new commit (and
+    may carry the first numstat entry after its last field), every other
+    record is a numstat entry. Each commit is yielded as soon as the next
+    one starts.
+    """
+    commit = None
+    total_insertions = 0
+    total_deletions = 0
+    rename_paths = 0
+    
+    for record in records:
+        if rename_paths:
+            # Source and destination of a rename, nothing to count
+            rename_paths -= 1
+            continue
+        
+        if record.startswith(RECORD_START):
+            if commit is not None:
+                commit['insertions'] = total_insertions
+                commit['deletions'] = total_deletions
+                yield commit
+            
+            commit_hash, subject, author, date, rest = record[1:].split(FIELD_SEP, 4)
+            body, _, record = rest.rpartition(FIELD_SEP)
+            commit = {
+                'hash': commit_hash,
+                'message': subject,
+                'author': author,
+                'date': date,
+                'body': body.strip()
+            }
+            total_insertions = 0
+            total_deletions = 0
+            # The first numstat entry follows the header on a new line
+            record = record.lstrip('\n')
+        
+        if not record or commit is None:
+            # Empty records close a commit's numstat list
+            continue
+        
+        # Numstat entry: insertions, deletions and path; binary files show "-"
+        fields = record.split('\t', 2)
+        if len(fields) != 3:
+            continue
+        insertions, deletions, path = fields
+        if insertions.isdigit() and deletions.isdigit():
+            total_insertions += int(insertions)
+            total_deletions += int(deletions)
+        if not path:
+            # Renames leave the path empty and give both paths as records
+            rename_paths = 2
+    
+    # Don't forget the last commit
+    if commit is not None:
+        commit['insertions'] = total_insertions
+        commit['deletions'] = total_deletions
+        yield commit
+
+def load_commit_cache(matcher: 'CommitMatcher', cache_file: str = COMMIT_CACHE_FILE) -> Tuple[Dict[str, list], bool]:
+    """Return (cached commits by hash, whether they changed since they were saved).
+
+    Entries saved under different commit rules are recategorized here.
+    """
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != COMMIT_CACHE_VERSION:
+            return {}, False
+        commits = data.get('commits', {})
+    except FileNotFoundError:
+        return {}, False
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable commit cache {cache_file}: {e}")
+        return {}, False
+    
+    if data.get('rules') == matcher.rules:
+        return commits, False
+    for entry in commits.values():
+        entry[6], entry[7] = matcher.match(entry[0])
+    return commits, True
+
+def save_commit_cache(commits: Dict[str, list], matcher: 'CommitMatcher', cache_file: str = COMMIT_CACHE_FILE):
+    """Write the commit cache atomically"""
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': COMMIT_CACHE_VERSION, 'rules': matcher.rules, 'commits': commits},
+                      f, separators=(',', ':'))
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        print(f"⚠️  Could not save commit cache {cache_file}: {e}")
+
+def iter_commits(hashes: List[str], prune: bool = False) -> Iterator[Dict]:
+    """Yield the given commits in order, with insertions, deletions and type.
+
+    Commits found in the commit cache are served from it and only the
+    others are read from a `git log` pipe, in the same order. Changelog or
+    version commits are dropped on the way. With prune, hashes is taken to
+    be the whole history and unreachable commits are dropped from the cache.
+    """
+    matcher = get_commit_matcher()
+    cache, changed = load_commit_cache(matcher)
+    missing = [commit_hash for commit_hash in hashes if commit_hash not in cache]
+    print(f"🗄️  Commit cache: {len(hashes) - len(missing)} cached, {len(missing)} to fetch")
+    
+    # --no-walk=unsorted shows exactly the requested commits, in the requested order
+    fetched = parse_git_log(stream_git_command(
+        ['git', 'log', '-z', '--pretty=format:' + LOG_FORMAT, '--numstat', '--no-walk=unsorted', '--stdin'],
+        '\0', stdin_lines=missing)) if missing else iter(())
+    
+    filtered = 0
+    for commit_hash in hashes:
+        entry = cache.get(commit_hash)
+        if entry is None:
+            commit = next(fetched, None)
+            if commit is None or commit['hash'] != commit_hash:
+                print(f"⚠️  Warning: git log did not return commit {commit_hash}, stopping")
+                break
+            # One scan both categorizes the commit and spots changelog updates or version bumps
+            commit['type'], skip = matcher.match(commit['message'])
+            cache[commit_hash] = [commit['message'], commit['author'], commit['date'], commit['body'],
+                                  commit['insertions'], commit['deletions'], commit['type'], skip]
+            changed = True
+        else:
+            message, author, date, body, insertions, deletions, commit_type, skip = entry
+            commit = {
+                'hash': commit_hash,
+                'message': message,
+                'author': author,
+                'date': date,
+                'body': body,
+                'insertions': insertions,
+                'deletions': deletions,
+                'type': commit_type
+            }
+        if skip:
+            filtered += 1
+            continue
+        yield commit
+    
+    if prune and len(cache) > len(hashes):
+        # The whole history was listed, so drop commits that are no longer reachable
+        reachable = set(hashes)
+        cache = {commit_hash: entry for commit_hash, entry in cache.items() if commit_hash in reachable}
+        changed = True
+    if changed:
+        save_commit_cache(cache, matcher)
+    print(f"📊 Filtered {filtered} changelog/version commits")
+
+def iter_commits_since_tag(tag: str) -> Iterator[Dict]:
+    """Yield commits since the specified tag, oldest first, with insertions and deletions"""
     try:
         # Verify the tag exists if it's not "none"
         if tag != "none" and not verify_tag_exists(tag):
@@ -83,112 +337,172 @@ def get_commits_since_tag(tag: str) -> List[Dict]:
         
         if tag == "none":
             # Get all commits if no previous tag
-            format_str = "%H|%s|%an|%ad|%b"
-            commits = run_git_command(['git', 'log', '--pretty=format:' + format_str, '--reverse', '--numstat'])
+            rev_list = ['git', 'rev-list', '--reverse', 'HEAD']
         else:
-            # Use more specific git log command to ensure we only get commits after the tag
-            format_str = "%H|%s|%an|%ad|%b"
             # Use --no-merges to exclude merge commits and be more specific about the range
-            commits = run_git_command(['git', 'log', '--pretty=format:' + format_str, '--reverse', '--no-merges', '--numstat', f'{tag}..HEAD'])
-        
-        if not commits:
+            rev_list = ['git', 'rev-list', '--reverse', '--no-merges', f'{tag}..HEAD']
+        hashes = [commit_hash for commit_hash in stream_git_command(rev_list) if commit_hash]
+        if not hashes:
             print(f"Warning: No git output received for tag range: {tag}")
-            return []
+            return
         
-        commit_list = []
-        current_commit = None
-        total_insertions = 0
-        total_deletions = 0
+        yield from iter_commits(hashes, prune=(tag == "none"))
         
-        for line in commits.split('\n'):
-            line = line.strip()
-            if not line:
+    except Exception as e:
+        print(f"Error processing commits: {e}")
+
+def get_commits_since_tag(tag: str) -> List[Dict]:
+    """Get all commits since the specified tag with detailed information including insertions and deletions"""
+    return list(iter_commits_since_tag(tag))
+
+def new_summary() -> Dict:
+    """An empty summary for add_to_summary()"""
+    return {
+        'categorized': defaultdict(list),
+        'total_commits': 0,
+        'insertions': 0,
+        'deletions': 0,
+        'samples': [],
+        'first_date': None,
+        'last_date': None,
+    }
+
+def add_to_summary(summary: Dict, commit: Dict, sample_size: int = 5):
+    """Fold one commit into a summary.
+
+    The commit is categorized and only its cleaned message is kept, along
+    with running totals, the first few commits as samples and the date range.
+    """
+    commit_type, _, _ = categorize_commit(commit)
+    summary['categorized'][commit_type].append(clean_commit_message(commit['message']))
+    summary['total_commits'] += 1
+    summary['insertions'] += commit.get('insertions', 0)
+    summary['deletions'] += commit.get('deletions', 0)
+    if len(summary['samples']) < sample_size:
+        summary['samples'].append(commit)
+    if summary['first_date'] is None:
+        summary['first_date'] = commit['date']
+    summary['last_date'] = commit['date']
+
+def summarize_commits(commits: Iterable[Dict], sample_size: int = 5) -> Dict:
+    """Fold a stream of commits into everything the changelog entry needs"""
+    summary = new_summary()
+    for commit in commits:
+        add_to_summary(summary, commit, sample_size)
+    return summary
+
+class CommitMatcher:
+    """Classifies and filters commit subjects in one pass.
+
+    Built once from a rule table: every keyword, with its inflected forms,
+    is entered in a lookup table of the category index it
+    belongs to and whether it marks a commit to skip. Matching splits the
+    subject into words with one precompiled regex and looks each word (and
+    each run of words, for phrase keywords) up in that table. A conventional
+    prefix ("fix: ...") wins, then the first category in rule order with a
+    match.
+    """
+    
+    WORD = re.compile(r'\w+')
+    
+    def __init__(self, categories: Dict[str, List[str]], skip_keywords: List[str]):
+        self.types = list(categories)
+        # The rule table in JSON form, so caches can tell which rules they were built with
+        self.rules = [{commit_type: list(keywords) for commit_type, keywords in categories.items()},
+                      list(skip_keywords)]
+        self.keywords = {}
+        for index, keywords in enumerate(categories.values()):
+            for form in self.keyword_forms(keywords):
+                # Earlier categories keep a keyword they share with later ones
+                category, skip = self.keywords.get(form, (None, False))
+                self.keywords[form] = (index if category is None else category, skip)
+        for form in self.keyword_forms(skip_keywords):
+            category, _ = self.keywords.get(form, (None, False))
+            self.keywords[form] = (category, True)
+        self.longest = max((form.count(' ') + 1 for form in self.keywords), default=1)
+    
+    @staticmethod
+    def keyword_forms(keywords: List[str]) -> List[str]:
+        """Lowercase keywords with their inflected endings; phrases inflect their last word"""
+        forms = []
+        for keyword in keywords:
+            words = CommitMatcher.WORD.findall(keyword.lower())
+            if not words:
                 continue
-                
-            # Check if this is a commit line (starts with commit hash)
-            if '|' in line and len(line.split('|')) >= 5:
-                # Save previous commit if exists
-                if current_commit is not None:
-                    current_commit['insertions'] = total_insertions
-                    current_commit['deletions'] = total_deletions
-                    commit_list.append(current_commit)
-                
-                # Start new commit
-                parts = line.split('|', 4)
-                current_commit = {
-                    'hash': parts[0],
-                    'message': parts[1],
-                    'author': parts[2],
-                    'date': parts[3],
-                    'body': parts[4] if len(parts) > 4 else ''
-                }
-                total_insertions = 0
-                total_deletions = 0
-            else:
-                # This is a file stat line (insertions deletions filename)
-                parts = line.split('\t')
-                if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
-                    total_insertions += int(parts[0])
-                    total_deletions += int(parts[1])
-        
-        # Don't forget the last commit
-        if current_commit is not None:
-            current_commit['insertions'] = total_insertions
-            current_commit['deletions'] = total_deletions
-            commit_list.append(current_commit)
-        
-        # Additional filtering to remove changelog-related commits that might be duplicates
-        filtered_commits = []
-        for commit in commit_list:
-            message = commit['message'].lower()
-            # Skip commits that are just changelog updates or version bumps
-            if not any(skip_word in message for skip_word in [
-                'update changelog', 'changelog', 'version', 'release', 
-                'bump version', 'update version', '📝 update changelog'
-            ]):
-                filtered_commits.append(commit)
+            stem, last = ' '.join(words), words[-1]
+            endings = ['', 's', 'es', 'd', 'ed', 'ing']
+            forms += [stem + ending for ending in endings]
+            if last.endswith('e'):
+                forms.append(stem[:-1] + 'ing')
+            if last.endswith('y'):
+                forms.append(stem[:-1] + 'ies')
+        return forms
+    
+    def match(self, message: str) -> Tuple[str, bool]:
+        """Return (commit type, skip) for a commit subject"""
+        message = message.lower()
+        words = self.WORD.findall(message)
+        keywords = self.keywords
+        if self.longest > 1:
+            # Phrase keywords: also look up every run of up to self.longest words
+            words += [' '.join(words[start:start + length])
+                      for length in range(2, self.longest + 1)
+                      for start in range(len(words) - length + 1)]
         
-        print(f"📊 Filtered {len(commit_list) - len(filtered_commits)} changelog/version commits")
-        return filtered_commits
+        best = len(self.types)
+        skip = False
+        for category, is_skip in [keywords[word] for word in words if word in keywords]:
+            skip = skip or is_skip
+            if category is not None and category < best:
+                best = category
         
-    except Exception as e:
-        print(f"Error processing commits: {e}")
-        return []
+        # Check for conventional commit format
+        prefix, colon, _ = message.partition(':')
+        if colon and prefix in COMMIT_TYPES:
+            return prefix, skip
+        return (self.types[best] if best < len(self.types) else FALLBACK_TYPE), skip
+
+def load_commit_rules(rules_file: str = RULES_FILE) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Return (categories, skip keywords): the defaults, overridden by rules_file if present"""
+    categories, skip_keywords = CATEGORY_RULES, SKIP_KEYWORDS
+    if not os.path.exists(rules_file):
+        return categories, skip_keywords
+    
+    try:
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        if 'categories' in rules:
+            categories = {}
+            for commit_type, keywords in rules['categories'].items():
+                if commit_type not in COMMIT_TYPES:
+                    print(f"⚠️  Warning: Unknown commit type '{commit_type}' in {rules_file}, ignoring it")
+                    continue
+                categories[commit_type] = [str(keyword) for keyword in keywords]
+        if 'skip' in rules:
+            skip_keywords = [str(keyword) for keyword in rules['skip']]
+        print(f"📏 Using commit rules from {rules_file}")
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        print(f"⚠️  Warning: Could not read {rules_file} ({e}), using default commit rules")
+        return CATEGORY_RULES, SKIP_KEYWORDS
+    
+    return categories, skip_keywords
+
+_commit_matcher = None
+
+def get_commit_matcher() -> CommitMatcher:
+    """The CommitMatcher for this repository, built on first use"""
+    global _commit_matcher
+    if _commit_matcher is None:
+        _commit_matcher = CommitMatcher(*load_commit_rules())
+    return _commit_matcher
 
 def categorize_commit(commit_data: Dict) -> Tuple[str, str, str]:
     """Categorize a commit message and return (type, emoji, description)"""
-    message = commit_data['message'].lower()
-    
-    # Check for conventional commit format
-    for commit_type, (emoji, description) in COMMIT_TYPES.items():
-        if message.startswith(f'{commit_type}:'):
-            return commit_type, emoji, description
-    
-    # Check for common patterns in the message
-    if any(word in message for word in ['add', 'new', 'feature', 'implement', 'create']):
-        return 'feat', '✨ Added', 'New features and enhancements'
-    elif any(word in message for word in ['fix', 'bug', 'issue', 'error', 'resolve']):
-        return 'fix', '🐛 Fixed', 'Bug fixes and improvements'
-    elif any(word in message for word in ['doc', 'readme', 'comment', 'changelog']):
-        return 'docs', '📚 Documentation', 'Documentation updates'
-    elif any(word in message for word in ['style', 'format', 'indent', 'ui', 'ux']):
-        return 'style', '🎨 Changed', 'Code style and formatting changes'
-    elif any(word in message for word in ['refactor', 'restructure', 'clean', 'optimize']):
-        return 'refactor', '🔧 Changed', 'Code refactoring and restructuring'
-    elif any(word in message for word in ['perf', 'performance', 'speed', 'optimize']):
-        return 'perf', '🚀 Performance', 'Performance improvements'
-    elif any(word in message for word in ['test', 'spec', 'coverage']):
-        return 'test', '🧪 Testing', 'Test additions and improvements'
-    elif any(word in message for word in ['security', 'vulnerability', 'auth', 'protect']):
-        return 'security', '🛡️ Security', 'Security improvements'
-    elif any(word in message for word in ['remove', 'delete', 'cleanup', 'deprecate', 'drop']):
-        return 'remove', '🗑️ Removed', 'Removed features and cleanup'
-    elif any(word in message for word in ['deps', 'dependency', 'package', 'npm', 'yarn']):
-        return 'deps', '📦 Changed', 'Dependency updates'
-    elif any(word in message for word in ['update', 'change', 'modify', 'improve']):
-        return 'chore', '🔧 Changed', 'Maintenance tasks and chores'
-    else:
-        return 'chore', '🔧 Changed', 'Maintenance tasks and chores'
+    commit_type = commit_data.get('type')
+    if commit_type is None:
+        commit_type, _ = get_commit_matcher().match(commit_data['message'])
+    emoji, description = COMMIT_TYPES[commit_type]
+    return commit_type, emoji, description
 
 def clean_commit_message(message: str) -> str:
     """Clean up commit message for display"""
@@ -289,9 +603,13 @@ def update_release_links(changelog_file: str, version: str) -> bool:
         print(f"Error updating release links: {e}")
         return False
 
-def generate_smart_changelog_entry(version: str, release_name: str = "", commits: List[Dict] = None) -> str:
-    """Generate a complete changelog entry with actual commit information"""
-    current_date = datetime.now().strftime('%Y-%m-%d')
+def generate_smart_changelog_entry(version: str, release_name: str = "", commits: List[Dict] = None,
+                                   release_date: str = None, summary: Dict = None) -> str:
+    """Generate a complete changelog entry from a list of commits, or from a
+    summarize_commits() summary when the commits were streamed"""
+    if summary is None:
+        summary = summarize_commits(commits or [])
+    current_date = release_date or datetime.now().strftime('%Y-%m-%d')
     
     # Determine release type and emoji
     if re.match(r'^v[0-9]+\.[0-9]+\.[0-9]+$', version):
@@ -318,29 +636,19 @@ def generate_smart_changelog_entry(version: str, release_name: str = "", commits
     
     entry += "\n"
     
-    if commits:
-        # Categorize commits
-        categorized = defaultdict(list)
-        for commit in commits:
-            commit_type, emoji, description = categorize_commit(commit)
-            categorized[commit_type].append(commit)
-        
+    if summary and summary['total_commits']:
         # Generate sections based on actual commits
+        categorized = summary['categorized']
         for commit_type, (emoji, description) in COMMIT_TYPES.items():
             if commit_type in categorized:
                 entry += f"### {emoji} {description}\n"
-                for commit in categorized[commit_type]:
-                    clean_msg = clean_commit_message(commit['message'])
+                for clean_msg in categorized[commit_type]:
                     entry += f"- {clean_msg}\n"
                 entry += "\n"
         
         # Add summary with insertions and deletions
-        total_commits = len(commits)
-        total_insertions = sum(commit.get('insertions', 0) for commit in commits)
-        total_deletions = sum(commit.get('deletions', 0) for commit in commits)
-        
-        entry += f"**Total Changes:** {total_commits} commits\n"
-        entry += f"**Code Changes:** +{total_insertions:,} insertions, -{total_deletions:,} deletions\n\n"
+        entry += f"**Total Changes:** {summary['total_commits']} commits\n"
+        entry += f"**Code Changes:** +{summary['insertions']:,} insertions, -{summary['deletions']:,} deletions\n\n"
     else:
         # Fallback template if no commits provided
         for emoji, description in COMMIT_TYPES.values():
@@ -350,13 +658,103 @@ def generate_smart_changelog_entry(version: str, release_name: str = "", commits
     entry += "---\n"
     return entry
 
+def get_release_tags() -> List[Tuple[str, str, str]]:
+    """Return (tag, commit hash, date) for every version-like tag, lowest version first"""
+    output = run_git_command(['git', 'tag', '--sort=version:refname',
+                              '--format=%(refname:short)%09%(objectname)%09%(*objectname)%09%(creatordate:short)'])
+    releases = []
+    for line in output.split('\n'):
+        fields = line.split('\t')
+        if len(fields) != 4:
+            continue
+        tag, objectname, peeled, date = fields
+        # Same filter as fix-release-links.py; annotated tags are peeled to their commit
+        if tag.startswith('v') or re.match(r'^[0-9]+\.[0-9]+', tag):
+            releases.append((tag, peeled or objectname, date))
+    return releases
+
+def bucket_commits_by_release(releases: List[Tuple[str, str, str]]) -> Tuple[List[str], Dict[str, int]]:
+    """Walk history once and find the first release that contains each commit.
+
+    `git rev-list --topo-order` lists every commit before its parents, so
+    by the time a commit is reached its release (the lowest index of any
+    tag it is reachable from) is final and can be handed on to its parents.
+    Returns (non-merge commits oldest first, hash -> index into releases);
+    commits not in any release yet are left out of both.
+    """
+    first_release = {}
+    for index, (_, commit_hash, _) in enumerate(releases):
+        first_release.setdefault(commit_hash, index)
+    
+    command = ['git', 'rev-list', '--topo-order', '--parents', 'HEAD']
+    command += sorted({commit_hash for _, commit_hash, _ in releases})
+    hashes = []
+    for line in stream_git_command(command):
+        if not line:
+            continue
+        commit_hash, *parents = line.split()
+        release = first_release.get(commit_hash)
+        if release is None:
+            continue
+        for parent in parents:
+            if first_release.get(parent, len(releases)) > release:
+                first_release[parent] = release
+        # Merges are left out, as when generating a single release's entry
+        if len(parents) <= 1:
+            hashes.append(commit_hash)
+    
+    hashes.reverse()
+    return hashes, first_release
+
+def backfill_changelog(output_file: str = BACKFILL_OUTPUT) -> bool:
+    """Generate entries for every release tag in one pass and write them to output_file"""
+    releases = get_release_tags()
+    if not releases:
+        print("⚠️  No release tags found")
+        return False
+    print(f"🏷️  Found {len(releases)} release tags ({releases[0][0]} to {releases[-1][0]})")
+    
+    try:
+        hashes, first_release = bucket_commits_by_release(releases)
+        summaries = [new_summary() for _ in releases]
+        for commit in iter_commits(hashes):
+            add_to_summary(summaries[first_release[commit['hash']]], commit)
+    except Exception as e:
+        print(f"Error processing commits: {e}")
+        return False
+    
+    # Newest release first, as in CHANGELOG.md
+    entries = []
+    for (tag, _, date), summary in reversed(list(zip(releases, summaries))):
+        print(f"  {tag} ({date}): {summary['total_commits']} commits, "
+              f"+{summary['insertions']:,} -{summary['deletions']:,}")
+        entries.append(generate_smart_changelog_entry(tag, release_date=date, summary=summary))
+    
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(entries))
+        print(f"\n✅ Backfilled changelog for {len(releases)} releases: {output_file}")
+        print("💡 Run scripts/fix-release-links.py to add any missing release links to CHANGELOG.md")
+    except Exception as e:
+        print(f"❌ Error writing to file: {e}")
+        return False
+    return True
+
 def main():
     """Main function"""
     if len(sys.argv) < 2:
         print("Usage: python smart-changelog.py <version> [release_name] [previous_tag]")
+        print("       python smart-changelog.py --backfill [output_file]")
         print("Example: python smart-changelog.py v0.6.4 'Changelog Automation' v0.4.0-Typhoon")
         sys.exit(1)
     
+    if sys.argv[1] == '--backfill':
+        output_file = sys.argv[2] if len(sys.argv) > 2 else BACKFILL_OUTPUT
+        print("Backfilling changelog entries for every release tag...")
+        if not backfill_changelog(output_file):
+            sys.exit(1)
+        return
+    
     version = sys.argv[1]
     release_name = sys.argv[2] if len(sys.argv) > 2 else ""
     previous_tag = sys.argv[3] if len(sys.argv) > 3 else "none"
@@ -364,30 +762,25 @@ def main():
     print(f"Generating smart changelog for version {version}...")
     print(f"🔍 Looking for commits since: {previous_tag if previous_tag != 'none' else 'beginning of repository'}")
     
-    # Get commits since the previous tag
-    commits = get_commits_since_tag(previous_tag)
+    # Stream commits since the previous tag straight into categorization
+    summary = summarize_commits(iter_commits_since_tag(previous_tag))
+    total_commits = summary['total_commits']
     
-    if commits:
-        total_insertions = sum(commit.get('insertions', 0) for commit in commits)
-        total_deletions = sum(commit.get('deletions', 0) for commit in commits)
-        
-        print(f"📝 Found {len(commits)} commits since {previous_tag if previous_tag != 'none' else 'beginning'}")
-        print(f"📊 Code changes: +{total_insertions:,} insertions, -{total_deletions:,} deletions")
+    if total_commits:
+        print(f"📝 Found {total_commits} commits since {previous_tag if previous_tag != 'none' else 'beginning'}")
+        print(f"📊 Code changes: +{summary['insertions']:,} insertions, -{summary['deletions']:,} deletions")
         
         # Show some sample commits
         print("\n📋 Sample commits:")
-        for i, commit in enumerate(commits[:5]):
+        for i, commit in enumerate(summary['samples']):
             insertions = commit.get('insertions', 0)
             deletions = commit.get('deletions', 0)
             print(f"  {i+1}. {commit['message']} (+{insertions}, -{deletions})")
-        if len(commits) > 5:
-            print(f"  ... and {len(commits) - 5} more")
+        if total_commits > len(summary['samples']):
+            print(f"  ... and {total_commits - len(summary['samples'])} more")
         
         # Show commit date range
-        if len(commits) > 0:
-            first_commit_date = commits[0]['date']
-            last_commit_date = commits[-1]['date']
-            print(f"\n📅 Commit date range: {first_commit_date} to {last_commit_date}")
+        print(f"\n📅 Commit date range: {summary['first_date']} to {summary['last_date']}")
     else:
         print("⚠️  No commits found")
         print("💡 This might mean:")
@@ -396,7 +789,7 @@ def main():
         print("   - All commits were filtered out (changelog/version commits)")
     
     # Generate the changelog entry
-    changelog = generate_smart_changelog_entry(version, release_name, commits)
+    changelog = generate_smart_changelog_entry(version, release_name, summary=summary)
     
     # Write to file
     output_file = f"smart-changelog-{version}.md"